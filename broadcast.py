@@ -0,0 +1,166 @@
+"""
+Concurrent, rate-budgeted broadcast of one message round to many groups.
+
+Up to ``concurrency`` sends are in flight at once. Each one waits for its
+turn from a shared PacingController, which enforces the account-wide send
+delay and the minimum interval between posts to the same group, with a
+little random jitter so posts don't land in lockstep. A broadcast to N groups
+therefore takes about N x the pacing delay, not N times a fixed sleep, and
+FloodWaits become scheduled retries instead of blocking a sender.
+"""
+
+import asyncio
+import heapq
+import logging
+import random
+import time
+from typing import Any, Awaitable, Callable, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from pacing import PacingController
+
+logger = logging.getLogger(__name__)
+
+
+class GroupResult(NamedTuple):
+    target: Any
+    ok: bool
+    latency: float
+    waited: float
+    attempts: int = 1
+    sent_at: float = 0.0
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class BroadcastReport:
+    """Outcome of one broadcast: wall time and per-group send latency."""
+
+    def __init__(self, results: List[GroupResult], wall_seconds: float):
+        self.results = results
+        self.wall_seconds = wall_seconds
+        self.successful = sum(1 for result in results if result.ok)
+        self.failed = len(results) - self.successful
+
+    def latencies(self) -> List[float]:
+        return [result.latency for result in self.results]
+
+    def first_sent(self) -> Optional[float]:
+        """Monotonic time of the earliest successful send, if any."""
+        return min((result.sent_at for result in self.results if result.ok), default=None)
+
+    def send_rate(self) -> float:
+        return self.successful / self.wall_seconds if self.wall_seconds else 0.0
+
+    def log(self, name: Callable[[Any], str] = str, slowest: int = 5) -> None:
+        latencies = self.latencies()
+        logger.info(
+            "📊 Broadcast report: %s sent, %s failed in %.1fs (%.2f msg/s)",
+            self.successful, self.failed, self.wall_seconds, self.send_rate(),
+        )
+        logger.info(
+            "⏱️  Send latency p50 %.0f ms · p95 %.0f ms · max %.0f ms",
+            percentile(latencies, 0.5) * 1000,
+            percentile(latencies, 0.95) * 1000,
+            max(latencies, default=0.0) * 1000,
+        )
+        for result in sorted(self.results, key=lambda result: result.latency, reverse=True)[:slowest]:
+            logger.info(
+                "   %s %s: %.0f ms (waited %.1fs, %s attempts)",
+                "✅" if result.ok else "❌", name(result.target), result.latency * 1000, result.waited,
+                result.attempts,
+            )
+
+
+class Broadcaster:
+    """Sends to many groups at once, paced by a shared PacingController.
+
+    Groups wait in a min-heap keyed by the time they may next be tried. A
+    FloodWait does not hold a worker: the group goes back on the heap at the
+    time Telegram named, and the pacing controller slows the account down.
+    """
+
+    def __init__(
+        self,
+        pacing: Optional[PacingController] = None,
+        concurrency: int = 4,
+        jitter: float = 0.5,
+        max_attempts: int = 5,
+        max_wait: float = 900,
+    ):
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        self.pacing = pacing or PacingController()
+        self.concurrency = concurrency
+        self.jitter = jitter
+        self.max_attempts = max_attempts
+        self.max_wait = max_wait
+
+    async def run(self, targets: Iterable[Any], send: Callable[[Any], Awaitable[bool]]) -> BroadcastReport:
+        """Call ``send(target)`` once per target; ``send`` returns success.
+
+        FloodWaitError and SlowModeWaitError raised by ``send`` are retried.
+        """
+        started = time.monotonic()
+        heap: List[Tuple[float, int, Any, int, float]] = []
+        for order, target in enumerate(targets):
+            heapq.heappush(heap, (self.pacing.ready_at(target), order, target, 1, started))
+        sequence = len(heap)
+        results: List[GroupResult] = []
+        in_flight: Set[asyncio.Task] = set()
+        wakeup = asyncio.Event()
+
+        async def attempt(target: Any, number: int, queued_at: float) -> None:
+            nonlocal sequence
+            if self.jitter > 0:
+                await asyncio.sleep(random.uniform(0, self.jitter))
+            await self.pacing.acquire(target)
+            send_started = time.monotonic()
+            try:
+                ok = bool(await send(target))
+            except Exception as exc:
+                retry_at = self.pacing.on_error(exc, target)
+                if retry_at is None:
+                    logger.error("❌ Unexpected error sending to %s: %s", target, exc)
+                elif number < self.max_attempts and retry_at - time.monotonic() <= self.max_wait:
+                    heapq.heappush(heap, (retry_at, sequence, target, number + 1, queued_at))
+                    sequence += 1
+                    return
+                else:
+                    logger.error("❌ Giving up on %s after %s flood waits", target, number)
+                ok = False
+            else:
+                if ok:
+                    self.pacing.on_success(target)
+            finished = time.monotonic()
+            results.append(
+                GroupResult(target, ok, finished - send_started, send_started - queued_at, number, finished)
+            )
+
+        def finished(task: asyncio.Task) -> None:
+            in_flight.discard(task)
+            wakeup.set()
+
+        while heap or in_flight:
+            now = time.monotonic()
+            if len(in_flight) >= self.concurrency or not heap or heap[0][0] > now:
+                wakeup.clear()
+                timeout = None
+                if heap and len(in_flight) < self.concurrency:
+                    timeout = heap[0][0] - now
+                try:
+                    await asyncio.wait_for(wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            _, _, target, number, queued_at = heapq.heappop(heap)
+            task = asyncio.ensure_future(attempt(target, number, queued_at))
+            in_flight.add(task)
+            task.add_done_callback(finished)
+
+        return BroadcastReport(results, time.monotonic() - started)
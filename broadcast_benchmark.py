@@ -0,0 +1,306 @@
+"""
+Scale benchmark for the group senders against a simulated Telegram backend.
+
+Drives the real broadcast_engine.BroadcastEngine - peer cache, pacing,
+broadcaster, templates and (optionally) the delivery ledger - against an
+in-process fake TelegramClient with thousands of groups. The backend adds
+configurable RPC latency, slow-RPC tails, random errors, injected FloodWait
+and slow-mode errors, and an optional account-wide rate limit that answers
+with FloodWait once exceeded, like Telegram does. Nothing touches the network.
+
+Usage:
+    python broadcast_benchmark.py --groups 500
+    python broadcast_benchmark.py --groups 5000 --jobs 4 --cycles 3 --rate 200 --max-rate 500
+    python broadcast_benchmark.py --groups 500 --rate-limit 30 --flood-rate 0.01 --error-rate 0.02
+"""
+
+import argparse
+import asyncio
+import logging
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+import zlib
+from typing import List, Optional
+
+from telethon.errors import ChatWriteForbiddenError, FloodWaitError, SlowModeWaitError
+from telethon.tl.types import InputPeerChannel
+
+from broadcast import percentile
+from broadcast_engine import BroadcastEngine, JobConfig, account_budget
+from delivery_ledger import DeliveryLedger
+from peer_cache import PeerCache
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+TEMPLATES = [
+    "🌟 Hourly Update 🌟\n\n⏰ Current Time: {timestamp}\n\n📢 Stay active and engaged!",
+    "👋 Hello {title}!\n\n🕐 Time: {timestamp}\n\nSee you in the next hour! 🎯",
+]
+
+
+class FakeMessage:
+    __slots__ = ("id",)
+
+    def __init__(self, message_id: int):
+        self.id = message_id
+
+
+class SimulatedTelegram:
+    """The subset of TelegramClient the broadcast engine uses, with simulated faults."""
+
+    def __init__(
+        self,
+        latency: float = 0.05,
+        latency_jitter: float = 0.5,
+        slow_rate: float = 0.0,
+        slow_latency: float = 1.0,
+        error_rate: float = 0.0,
+        flood_rate: float = 0.0,
+        flood_seconds: float = 2.0,
+        slow_mode_rate: float = 0.0,
+        rate_limit: float = 0.0,
+        burst: float = 20,
+        seed: int = 1,
+    ):
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.error_rate = error_rate
+        self.flood_rate = flood_rate
+        self.flood_seconds = flood_seconds
+        self.slow_mode_rate = slow_mode_rate
+        self.rate_limit = rate_limit
+        self.burst = burst
+        self.rng = random.Random(seed)
+        self._tokens = burst
+        self._refilled = time.monotonic()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.resolves = 0
+        self.calls = 0
+        self.sent = 0
+        self.errors = 0
+        self.flood_waits = 0
+        self.slow_modes = 0
+
+    async def _rpc(self) -> None:
+        delay = self.latency * self.rng.uniform(1 - self.latency_jitter, 1 + self.latency_jitter)
+        if self.slow_rate and self.rng.random() < self.slow_rate:
+            delay += self.slow_latency
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def _rate_limited(self) -> Optional[int]:
+        """Seconds of FloodWait if the account-wide budget is spent, else None."""
+        if not self.rate_limit:
+            return None
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled) * self.rate_limit)
+        self._refilled = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return None
+        return max(1, round((1 - self._tokens) / self.rate_limit))
+
+    async def get_entity(self, key: str):
+        self.resolves += 1
+        await self._rpc()
+        return InputPeerChannel(zlib.crc32(key.encode("utf-8")), 1)
+
+    async def send_message(self, entity, message: str):
+        self.calls += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            await self._rpc()
+            roll = self.rng.random()
+            if roll < self.flood_rate:
+                self.flood_waits += 1
+                raise FloodWaitError(None, capture=self.flood_seconds)
+            roll -= self.flood_rate
+            if roll < self.slow_mode_rate:
+                self.slow_modes += 1
+                raise SlowModeWaitError(None, capture=self.flood_seconds)
+            roll -= self.slow_mode_rate
+            if roll < self.error_rate:
+                self.errors += 1
+                raise ChatWriteForbiddenError(None)
+            wait = self._rate_limited()
+            if wait is not None:
+                self.flood_waits += 1
+                raise FloodWaitError(None, capture=wait)
+            self.sent += 1
+            return FakeMessage(self.sent)
+        finally:
+            self.in_flight -= 1
+
+
+def peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes elsewhere.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+async def simulate(
+    backend: SimulatedTelegram,
+    groups: int,
+    jobs: int = 1,
+    cycles: int = 1,
+    concurrency: int = 32,
+    rate: float = 100.0,
+    max_rate: float = 200.0,
+    jitter: float = 0.0,
+    max_attempts: int = 5,
+    ledger_path: Optional[str] = None,
+) -> List[dict]:
+    """Broadcast ``cycles`` times to ``groups`` fake groups split over ``jobs`` jobs."""
+    names = [f"@sim_group_{index}" for index in range(groups)]
+    configs = [
+        JobConfig(
+            f"sim{job}",
+            names[job::jobs],
+            templates=TEMPLATES,
+            concurrency=concurrency,
+            rate=rate,
+            max_rate=max_rate,
+            group_interval=0,
+            jitter=jitter,
+            max_attempts=max_attempts,
+        )
+        for job in range(jobs)
+    ]
+    ledger = DeliveryLedger(ledger_path)
+    ledger.open()
+    # The account budget matches one job's, so --jobs splits it rather than multiplying it.
+    engine = BroadcastEngine(
+        backend, configs, PeerCache(None), account_pacing=account_budget(rate, max_rate), ledger=ledger
+    )
+    results = []
+    try:
+        for cycle in range(1, cycles + 1):
+            calls, floods, resolves = backend.calls, backend.flood_waits, backend.resolves
+            started = time.perf_counter()
+            reports = await engine.run_once()
+            wall = time.perf_counter() - started
+            latencies = [latency for report in reports.values() for latency in report.latencies()]
+            sent = sum(report.successful for report in reports.values())
+            results.append({
+                "cycle": cycle,
+                "groups": groups,
+                "sent": sent,
+                "failed": sum(report.failed for report in reports.values()),
+                "cycle_seconds": wall,
+                "sends_per_second": sent / wall if wall else 0.0,
+                "rpc_calls": backend.calls - calls,
+                "resolves": backend.resolves - resolves,
+                "flood_waits": backend.flood_waits - floods,
+                "p50_ms": percentile(latencies, 0.50) * 1000,
+                "p95_ms": percentile(latencies, 0.95) * 1000,
+                "mean_ms": (statistics.fmean(latencies) * 1000) if latencies else 0.0,
+                "send_delay": max(runner.pacing.delay for runner in engine.runners.values()),
+            })
+    finally:
+        await ledger.close()
+    return results
+
+
+def print_report(results: List[dict], backend: SimulatedTelegram, memory: dict) -> None:
+    print("📊 Broadcast simulation results")
+    for result in results:
+        print(
+            f"   Cycle {result['cycle']}: {result['sent']}/{result['groups']} sent, {result['failed']} failed"
+            f" in {result['cycle_seconds']:.2f}s ({result['sends_per_second']:,.1f} msg/s)"
+        )
+        print(
+            f"      RPCs {result['rpc_calls']} · resolves {result['resolves']}"
+            f" · FloodWaits {result['flood_waits']}"
+            f" · latency p50 {result['p50_ms']:.1f} ms, p95 {result['p95_ms']:.1f} ms,"
+            f" mean {result['mean_ms']:.1f} ms · pacing delay {result['send_delay'] * 1000:.1f} ms"
+        )
+    total = sum(result["cycle_seconds"] for result in results)
+    sent = sum(result["sent"] for result in results)
+    print(f"   Total:           {sent} sends in {total:.2f}s ({sent / total if total else 0:,.1f} msg/s)")
+    print(f"   Peak in flight:  {backend.peak_in_flight}")
+    print(f"   Injected:        {backend.errors} errors, {backend.slow_modes} slow-mode waits")
+    if memory.get("rss_mb") is not None:
+        print(f"   Peak RSS:        {memory['rss_mb']:.1f} MB")
+    if memory.get("traced_mb") is not None:
+        print(f"   Peak traced:     {memory['traced_mb']:.1f} MB (Python allocations)")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the broadcast engine against a simulated Telegram.")
+    parser.add_argument("--groups", type=int, default=500, help="number of fake groups")
+    parser.add_argument("--jobs", type=int, default=1, help="split the groups over this many jobs")
+    parser.add_argument("--cycles", type=int, default=1, help="broadcast cycles (the first resolves every group)")
+    parser.add_argument("--concurrency", type=int, default=32, help="sends in flight per job")
+    parser.add_argument("--rate", type=float, default=100.0, help="starting sends/sec per job")
+    parser.add_argument("--max-rate", type=float, default=200.0, help="ceiling the pacing may ramp up to")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random extra spacing per send (seconds)")
+    parser.add_argument("--max-attempts", type=int, default=5, help="flood-wait retries per group")
+    parser.add_argument("--latency", type=float, default=0.05, help="mean RPC latency in seconds")
+    parser.add_argument("--latency-jitter", type=float, default=0.5, help="latency spread as a fraction of the mean")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="share of RPCs that are slow")
+    parser.add_argument("--slow-latency", type=float, default=1.0, help="extra seconds for a slow RPC")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of sends failing with a write error")
+    parser.add_argument("--flood-rate", type=float, default=0.0, help="share of sends answered with FloodWait")
+    parser.add_argument("--slow-mode-rate", type=float, default=0.0, help="share of sends hitting slow mode")
+    parser.add_argument("--flood-seconds", type=float, default=2.0, help="wait named by injected flood errors")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="account sends/sec before FloodWait (0: off)")
+    parser.add_argument("--burst", type=float, default=20, help="sends allowed above --rate-limit in a burst")
+    parser.add_argument("--ledger", help="record deliveries in this ledger database")
+    parser.add_argument("--trace-memory", action="store_true", help="also trace Python allocations (slower)")
+    parser.add_argument("--log-level", default="CRITICAL", help="engine log level, e.g. INFO or WARNING")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    if args.groups < 1 or args.jobs < 1 or args.jobs > args.groups:
+        parser.error("need at least one group per job")
+
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s [%(levelname)s] %(message)s")
+    backend = SimulatedTelegram(
+        latency=args.latency,
+        latency_jitter=args.latency_jitter,
+        slow_rate=args.slow_rate,
+        slow_latency=args.slow_latency,
+        error_rate=args.error_rate,
+        flood_rate=args.flood_rate,
+        flood_seconds=args.flood_seconds,
+        slow_mode_rate=args.slow_mode_rate,
+        rate_limit=args.rate_limit,
+        burst=args.burst,
+        seed=args.seed,
+    )
+    random.seed(args.seed)  # The broadcaster's jitter
+    if args.trace_memory:
+        tracemalloc.start()
+    results = asyncio.run(simulate(
+        backend,
+        args.groups,
+        jobs=args.jobs,
+        cycles=args.cycles,
+        concurrency=args.concurrency,
+        rate=args.rate,
+        max_rate=args.max_rate,
+        jitter=args.jitter,
+        max_attempts=args.max_attempts,
+        ledger_path=args.ledger,
+    ))
+    memory = {"rss_mb": peak_rss_mb(), "traced_mb": None}
+    if args.trace_memory:
+        memory["traced_mb"] = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        tracemalloc.stop()
+    print_report(results, backend, memory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,349 @@
+"""
+Reusable group broadcast engine shared by the userbot entry points.
+
+A jobs file describes independent broadcast jobs - target groups, message
+templates, schedule and rate budget - for example::
+
+    {
+      "account_rate": 1.0,
+      "account_max_rate": 2.0,
+      "defaults": {"concurrency": 4, "rate": 1.0, "max_rate": 2.0},
+      "jobs": [
+        {
+          "name": "hourly",
+          "groups": ["@group_one", "https://t.me/+AbCdEf"],
+          "templates": ["🌟 Hourly Update 🌟\\n\\n⏰ {timestamp}"],
+          "template_files": ["templates/hourly/*.txt"],
+          "custom": {"@group_one": "Custom message at {timestamp}"},
+          "schedule": "3600"
+        }
+      ]
+    }
+
+All jobs run concurrently on one TelegramClient. Each has its own pacing
+budget, and they share an account-level pacing controller
+(``account_rate``/``account_max_rate``), so all jobs together never send
+faster than the account budget and a FloodWait on any job slows all of
+them. Groups are resolved through the shared peer cache. Invite links are
+joined only on a cache miss.
+
+Templates (inline and from ``template_files``, relative to the jobs file)
+are compiled once when the jobs are loaded, and each cycle renders every
+distinct message once (see templates.RenderCycle). With a RotationState,
+each job continues its template rotation where it left off after a restart.
+With a DeliveryLedger, every delivery is recorded and a cycle interrupted by
+a crash is resumed for the groups it had not reached yet.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence
+
+from telethon import TelegramClient, functions
+from telethon.errors import FloodWaitError, RPCError, SlowModeWaitError, UserAlreadyParticipantError
+
+from broadcast import BroadcastReport, Broadcaster
+from delivery_ledger import DeliveryLedger
+from pacing import PacingController
+from peer_cache import PeerCache
+from scheduler import Scheduler, parse_schedule, spread_offset
+from templates import CompiledTemplate, RenderCycle, RotationState, load_template_files
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+ACCOUNT_DEFAULTS: Dict[str, float] = {"account_rate": 1.0, "account_max_rate": 2.0}
+
+JOB_DEFAULTS: Dict[str, Any] = {
+    "templates": [],
+    "template_files": [],
+    "custom": {},
+    "schedule": "3600",
+    "timestamp_format": DEFAULT_TIMESTAMP_FORMAT,
+    "concurrency": 4,
+    "rate": 1.0,
+    "max_rate": 2.0,
+    "group_interval": 60,
+    "jitter": 0.5,
+    "max_attempts": 5,
+}
+
+
+class JobConfig:
+    """One broadcast job: who to send to, what, when and how fast."""
+
+    __slots__ = ("name", "groups") + tuple(JOB_DEFAULTS)
+
+    def __init__(self, name: str, groups: Sequence[str], base_dir: str = ".", **options: Any):
+        unknown = set(options) - set(JOB_DEFAULTS)
+        if unknown:
+            raise ValueError(f"Unknown options for job {name!r}: {', '.join(sorted(unknown))}")
+        settings = {**JOB_DEFAULTS, **options}
+        self.name = name
+        self.groups = [group.strip() for group in groups if group.strip()]
+        self.template_files = list(settings["template_files"])
+        self.templates: List[CompiledTemplate] = [
+            CompiledTemplate(source, f"{name}#{index}") for index, source in enumerate(settings["templates"], 1)
+        ] + load_template_files(self.template_files, base_dir)
+        self.custom: Dict[str, CompiledTemplate] = {
+            group: CompiledTemplate(source, f"{name}:{group}") for group, source in settings["custom"].items()
+        }
+        self.schedule = str(settings["schedule"])
+        self.timestamp_format = settings["timestamp_format"]
+        self.concurrency = int(settings["concurrency"])
+        self.rate = float(settings["rate"])
+        self.max_rate = float(settings["max_rate"])
+        self.group_interval = float(settings["group_interval"])
+        self.jitter = float(settings["jitter"])
+        self.max_attempts = int(settings["max_attempts"])
+        if not self.groups:
+            raise ValueError(f"Job {name!r} has no target groups")
+        if not self.templates:
+            raise ValueError(f"Job {name!r} has no message templates")
+        if self.rate <= 0:
+            raise ValueError(f"Job {name!r} needs a positive rate")
+        parse_schedule(self.schedule)  # Fail on load, not at the first run
+
+
+def load_jobs(path: str) -> List[JobConfig]:
+    with open(path, "r", encoding="utf-8") as handle:
+        data = json.load(handle)
+    defaults = data.get("defaults", {})
+    base_dir = os.path.dirname(os.path.abspath(path))
+    jobs = []
+    for index, entry in enumerate(data.get("jobs", []), 1):
+        entry = {**defaults, **entry}
+        name = entry.pop("name", f"job{index}")
+        groups = entry.pop("groups", [])
+        jobs.append(JobConfig(name, groups, base_dir, **entry))
+    if not jobs:
+        raise ValueError(f"No jobs defined in {path}")
+    if len({job.name for job in jobs}) != len(jobs):
+        raise ValueError(f"Duplicate job names in {path}")
+    return jobs
+
+
+def account_budget(
+    rate: float = ACCOUNT_DEFAULTS["account_rate"],
+    max_rate: float = ACCOUNT_DEFAULTS["account_max_rate"],
+) -> PacingController:
+    """Account-wide send budget shared by every job (FloodWait is per account)"""
+    if rate <= 0:
+        raise ValueError("The account send rate must be positive")
+    return PacingController(delay=1 / rate, min_delay=1 / max(rate, max_rate))
+
+
+def load_account_budget(path: str) -> PacingController:
+    """The account budget from a jobs file's ``account_rate``/``account_max_rate``"""
+    with open(path, "r", encoding="utf-8") as handle:
+        data = json.load(handle)
+    settings = {**ACCOUNT_DEFAULTS, **{key: data[key] for key in ACCOUNT_DEFAULTS if key in data}}
+    return account_budget(float(settings["account_rate"]), float(settings["account_max_rate"]))
+
+
+def parse_groups(groups_str: str) -> List[str]:
+    """Parse comma-separated group usernames/IDs/invite links"""
+    return [group.strip() for group in groups_str.split(",") if group.strip()]
+
+
+def is_invite_link(group: str) -> bool:
+    return "t.me/+" in group or "t.me/joinchat/" in group
+
+
+def invite_hash(invite_link: str) -> str:
+    hash_part = invite_link.rstrip("/").split("/")[-1]
+    return hash_part[1:] if hash_part.startswith("+") else hash_part
+
+
+class JobRunner:
+    """Runtime state of one job: its pacing budget and template rotation."""
+
+    def __init__(self, job: JobConfig, account: PacingController, message_index: int = 0):
+        self.job = job
+        self.pacing = PacingController(
+            delay=1 / job.rate,
+            min_delay=1 / max(job.rate, job.max_rate),
+            target_interval=job.group_interval,
+            account=account,
+        )
+        self.broadcaster = Broadcaster(
+            self.pacing, concurrency=job.concurrency, jitter=job.jitter, max_attempts=job.max_attempts
+        )
+        self.message_index = message_index
+        self.cycles = 0
+
+    def start_cycle(self, now: Optional[datetime] = None) -> RenderCycle:
+        """Render cache for one cycle; the timestamp is formatted once for all groups"""
+        return RenderCycle(timestamp=(now or datetime.now()).strftime(self.job.timestamp_format))
+
+    def render(self, cycle: RenderCycle, group: str, title: str) -> str:
+        """Message for ``group`` this cycle: its custom text or the rotating template"""
+        template = self.job.custom.get(group)
+        if template is None:
+            template = self.job.templates[self.message_index % len(self.job.templates)]
+        return cycle.render(template, group=group, title=title)
+
+
+class BroadcastEngine:
+    """Runs many broadcast jobs concurrently on one TelegramClient."""
+
+    def __init__(
+        self,
+        client: TelegramClient,
+        jobs: Iterable[JobConfig],
+        peers: Optional[PeerCache] = None,
+        account_pacing: Optional[PacingController] = None,
+        rotation: Optional[RotationState] = None,
+        ledger: Optional[DeliveryLedger] = None,
+    ):
+        self.client = client
+        self.peers = peers or PeerCache(None)
+        self.rotation = rotation or RotationState(None)
+        self.ledger = ledger or DeliveryLedger(None)
+        # Shared by every job: the send budget and FloodWait are account-wide.
+        self.account_pacing = account_pacing or account_budget()
+        # Joins have a much stricter limit, so they are paced separately.
+        self.join_pacing = PacingController(delay=10, min_delay=5)
+        self.runners: Dict[str, JobRunner] = {
+            job.name: JobRunner(job, self.account_pacing, self.rotation.get(job.name)) for job in jobs
+        }
+
+    async def resolve_group(self, client: TelegramClient, group: str):
+        """Resolve a group on a peer cache miss, joining invite links first"""
+        if is_invite_link(group):
+            try:
+                # Flood waits are retried by the pacing controller, not by recursion
+                result = await self.join_pacing.call(
+                    lambda: client(functions.messages.ImportChatInviteRequest(invite_hash(group)))
+                )
+                logger.info("✅ Joined group via invite link")
+                if result.chats:
+                    return result.chats[0]
+            except UserAlreadyParticipantError:
+                pass  # Already a member; the link still resolves below
+        return await client.get_entity(group)
+
+    async def verify(self) -> int:
+        """Resolve every job's groups up front and drop the unreachable ones.
+
+        Returns how many groups are reachable. Dropped groups are not retried
+        every cycle, which for invite links would mean another flood-limited
+        join attempt each time.
+        """
+        reachable = 0
+        unreachable = set()
+        for group in {group for runner in self.runners.values() for group in runner.job.groups}:
+            try:
+                await self.peers.resolve(self.client, group, self.resolve_group)
+            except (RPCError, ValueError, TypeError) as exc:
+                logger.error("❌ Cannot access group '%s': %s", group, exc)
+                unreachable.add(group)
+                continue
+            logger.info("✅ Verified access to: %s", self.peers.title(group))
+            reachable += 1
+        self.peers.save()
+        for name, runner in self.runners.items():
+            runner.job.groups = [group for group in runner.job.groups if group not in unreachable]
+            if not runner.job.groups:
+                logger.warning("⚠️  %s has no accessible groups", name)
+        return reachable
+
+    async def send(self, group: str, message: str):
+        """Send to one group; returns the sent message, or None if it failed.
+
+        Flood errors propagate so the broadcaster reschedules the group.
+        """
+        try:
+            sent = await self.peers.call(
+                self.client, group, lambda peer: self.client.send_message(peer, message), self.resolve_group
+            )
+        except (FloodWaitError, SlowModeWaitError):
+            raise
+        except (RPCError, ValueError, TypeError) as exc:
+            logger.error("❌ Error sending to %s: %s", group, exc)
+            return None
+        logger.info("✅ Sent to: %s", self.peers.title(group))
+        return sent
+
+    async def broadcast(self, name: str) -> BroadcastReport:
+        """One cycle of job ``name``: render, send to every group not yet served, rotate"""
+        runner = self.runners[name]
+        runner.cycles += 1
+        number, delivered = await self.ledger.begin_cycle(name, len(runner.job.groups))
+        cycle = runner.start_cycle()
+        messages = {
+            group: runner.render(cycle, group, self.peers.title(group))
+            for group in runner.job.groups
+            if group not in delivered
+        }
+        logger.info(
+            "📤 %s cycle #%s: %s groups, %s distinct messages (%s at a time, %.2f msg/s)",
+            name, number, len(messages), cycle.renders, runner.job.concurrency, 1 / runner.pacing.delay,
+        )
+
+        async def deliver(group: str) -> bool:
+            started = time.monotonic()
+            sent = await self.send(group, messages[group])
+            await self.ledger.record(
+                name, number, group, getattr(sent, "id", None), "sent" if sent else "failed",
+                time.monotonic() - started,
+            )
+            return bool(sent)
+
+        report = await runner.broadcaster.run(messages, deliver)
+        await self.ledger.finish_cycle(name, number)
+        # Rotate to next message template, and remember it across restarts
+        runner.message_index += 1
+        self.rotation.set(name, runner.message_index)
+        logger.info("✅ %s complete: %s successful, %s failed", name, report.successful, report.failed)
+        report.log(self.peers.title)
+        self.peers.save()
+        return report
+
+    async def run_once(self) -> Dict[str, BroadcastReport]:
+        """One broadcast of every job, all jobs at once"""
+        names = list(self.runners)
+        reports = await asyncio.gather(*(self.broadcast(name) for name in names))
+        return dict(zip(names, reports))
+
+    def schedule(self, scheduler: Scheduler, spread: float = 0, run_now: bool = True) -> None:
+        for name, runner in self.runners.items():
+            schedule = parse_schedule(runner.job.schedule, spread_offset(name, spread))
+            scheduler.add(name, schedule, lambda name=name: self.broadcast(name), run_now=run_now)
+            logger.info("⏱️  %s: %s for %s groups", name, schedule, len(runner.job.groups))
+
+    async def run(self, spread: float = 0) -> None:
+        """Broadcast every job now and then on its own schedule, until cancelled"""
+        scheduler = Scheduler()
+        self.schedule(scheduler, spread)
+        await scheduler.run()
+
+
+def jobs_from_mapping(
+    name: str,
+    groups: Sequence[str],
+    templates: Sequence[str],
+    group_schedules: Optional[Mapping[str, str]] = None,
+    **options: Any,
+) -> List[JobConfig]:
+    """Build jobs for the env-configured scripts: one per distinct schedule"""
+    default_schedule = str(options.pop("schedule", JOB_DEFAULTS["schedule"]))
+    by_schedule: Dict[str, List[str]] = {}
+    for group in groups:
+        spec = str((group_schedules or {}).get(group, default_schedule))
+        by_schedule.setdefault(spec, []).append(group)
+    if not by_schedule:
+        return [JobConfig(name, groups, templates=templates, schedule=default_schedule, **options)]
+    if len(by_schedule) == 1:
+        # Every group may share one override, which then replaces the default.
+        spec, members = next(iter(by_schedule.items()))
+        return [JobConfig(name, members, templates=templates, schedule=spec, **options)]
+    return [
+        JobConfig(f"{name} [{spec}]", members, templates=templates, schedule=spec, **options)
+        for spec, members in by_schedule.items()
+    ]
@@ -0,0 +1,65 @@
+"""
+Last-processed message id per source chat, persisted across restarts.
+
+Updates only touch an in-memory dict; a background task writes the JSON file
+atomically when something changed, and close() flushes on shutdown.
+"""
+
+import asyncio
+import json
+import logging
+import os
+from typing import Dict, Optional
+
+
+class CheckpointStore:
+    """Tracks the highest message id seen for each source chat."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._last_ids: Dict[int, int] = {}
+        self._dirty = False
+
+    def load(self) -> None:
+        if self.path is None or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as handle:
+                data = json.load(handle)
+        except (OSError, ValueError) as exc:
+            logging.warning("Ignoring unreadable checkpoint file %s: %s", self.path, exc)
+            return
+        self._last_ids = {int(chat_id): int(message_id) for chat_id, message_id in data.items()}
+
+    def get(self, chat_id: int) -> Optional[int]:
+        return self._last_ids.get(chat_id)
+
+    def advance(self, chat_id: int, message_id: int) -> None:
+        if message_id > self._last_ids.get(chat_id, 0):
+            self._last_ids[chat_id] = message_id
+            self._dirty = True
+
+    def flush(self) -> None:
+        if self.path is None or not self._dirty:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as handle:
+            json.dump({str(chat_id): message_id for chat_id, message_id in self._last_ids.items()}, handle)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+
+    async def run_flush(self, interval: float = 5) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.flush()
+            except OSError as exc:
+                logging.warning("Failed to write checkpoints: %s", exc)
+
+    def close(self) -> None:
+        try:
+            self.flush()
+        except OSError as exc:
+            logging.warning("Failed to write checkpoints: %s", exc)
@@ -0,0 +1,171 @@
+"""
+Duplicate suppression for the rain monitor.
+
+ProcessedMessageStore is a bounded, insertion-ordered store of processed
+(chat_id, message_id) keys. Membership checks and inserts are O(1) on an
+OrderedDict that evicts the oldest key once full. Every change is appended
+to a small log file which is replayed on startup and periodically
+compacted, so a restart resumes with the same recent history instead of
+re-forwarding alerts.
+
+RecentFingerprints catches the same rain arriving under a different id or
+from another channel, remembering content hashes for a sliding window.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict, deque
+from typing import IO, Deque, Iterator, Optional, Set, Tuple
+
+MessageKey = Tuple[int, int]
+
+
+class ProcessedMessageStore:
+    """O(1) ring of recently processed message keys with an append-only log."""
+
+    def __init__(self, capacity: int = 5000, path: Optional[str] = None):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+        self.path = path
+        self._keys: "OrderedDict[MessageKey, None]" = OrderedDict()
+        self._log: Optional[IO[str]] = None
+        self._log_records = 0
+
+    def __contains__(self, key: MessageKey) -> bool:
+        return key in self._keys
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __iter__(self) -> Iterator[MessageKey]:
+        return iter(self._keys)
+
+    def add(self, key: MessageKey) -> None:
+        if key in self._keys:
+            return
+        self._keys[key] = None
+        self._append("+", key)
+        while len(self._keys) > self.capacity:
+            self._keys.popitem(last=False)
+
+    def discard(self, key: MessageKey) -> None:
+        if key in self._keys:
+            del self._keys[key]
+            self._append("-", key)
+
+    def open(self) -> None:
+        """Replay the on-disk log (if any) and keep it open for appends."""
+        if self.path is None or self._log is not None:
+            return
+        if os.path.exists(self.path):
+            self._replay()
+        self._log = open(self.path, "a", encoding="utf-8", buffering=1)
+        if self._log_records > 2 * self.capacity:
+            self.compact()
+
+    def _replay(self) -> None:
+        with open(self.path, "r", encoding="utf-8") as handle:
+            for line in handle:
+                self._log_records += 1
+                try:
+                    op, chat_id, message_id = line.split()
+                    key = (int(chat_id), int(message_id))
+                except ValueError:
+                    # A torn final write from a crash; skip it.
+                    continue
+                if op == "+":
+                    self._keys.pop(key, None)
+                    self._keys[key] = None
+                    if len(self._keys) > self.capacity:
+                        self._keys.popitem(last=False)
+                elif op == "-":
+                    self._keys.pop(key, None)
+
+    def _append(self, op: str, key: MessageKey) -> None:
+        if self._log is None:
+            return
+        self._log.write(f"{op} {key[0]} {key[1]}\n")
+        self._log_records += 1
+
+    def compact(self) -> None:
+        """Rewrite the log so it holds exactly the keys currently retained."""
+        if self.path is None:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as handle:
+            for chat_id, message_id in self._keys:
+                handle.write(f"+ {chat_id} {message_id}\n")
+            handle.flush()
+            os.fsync(handle.fileno())
+        if self._log is not None:
+            self._log.close()
+        os.replace(tmp_path, self.path)
+        self._log_records = len(self._keys)
+        self._log = open(self.path, "a", encoding="utf-8", buffering=1)
+
+    async def run_compaction(self, interval: float = 600) -> None:
+        """Compact the log every ``interval`` seconds once it has grown."""
+        while True:
+            await asyncio.sleep(interval)
+            if self._log_records > len(self._keys) + self.capacity // 10:
+                try:
+                    self.compact()
+                except OSError as exc:
+                    logging.warning("Failed to compact processed message log: %s", exc)
+
+    def close(self) -> None:
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+
+class RecentFingerprints:
+    """Time-decaying set of 64-bit fingerprints split into rotating generations.
+
+    A lookup checks every generation; every ``ttl_seconds / generations`` the
+    oldest generation is dropped whole, so entries live between
+    ``ttl * (g - 1) / g`` and ``ttl`` seconds and memory stays flat. A
+    generation that fills up rotates early to keep the bound under bursts.
+    """
+
+    def __init__(self, ttl_seconds: float = 900, generations: int = 4, max_per_generation: int = 50_000):
+        if generations < 2:
+            raise ValueError("generations must be at least 2")
+        self.rotate_every = ttl_seconds / generations
+        self.max_per_generation = max_per_generation
+        self._generations: Deque[Set[int]] = deque([set() for _ in range(generations)], maxlen=generations)
+        self._rotated_at = time.monotonic()
+
+    def _maybe_rotate(self) -> None:
+        now = time.monotonic()
+        if now - self._rotated_at < self.rotate_every and len(self._generations[-1]) < self.max_per_generation:
+            return
+        steps = max(1, min(len(self._generations), int((now - self._rotated_at) // self.rotate_every)))
+        for _ in range(steps):
+            self._generations.append(set())
+        self._rotated_at = now
+
+    def __contains__(self, fingerprint: int) -> bool:
+        self._maybe_rotate()
+        return any(fingerprint in generation for generation in self._generations)
+
+    def __len__(self) -> int:
+        return sum(len(generation) for generation in self._generations)
+
+    def add(self, fingerprint: int) -> None:
+        self._maybe_rotate()
+        self._generations[-1].add(fingerprint)
+
+    def check_and_add(self, fingerprint: int) -> bool:
+        """Record ``fingerprint``; return True if it was already present."""
+        if fingerprint in self:
+            return True
+        self._generations[-1].add(fingerprint)
+        return False
+
+    def discard(self, fingerprint: int) -> None:
+        for generation in self._generations:
+            generation.discard(fingerprint)
@@ -0,0 +1,243 @@
+"""
+Crash-safe ledger of group broadcast deliveries.
+
+Every send the broadcast engine makes is recorded as (job, cycle, group,
+message id, status, latency) in SQLite (WAL) through the shared writer
+thread (sqlite_store.BatchedWriter). A successful send is committed before
+the broadcaster counts it, with concurrent sends sharing one commit, so the
+only way to repeat a delivery is a crash in the moment between Telegram
+accepting the message and that commit. Failures are batched.
+
+Each job's cycles are numbered persistently. If the process dies in the
+middle of a cycle, the next run of that job resumes the same cycle and only
+sends to the groups that have no successful delivery yet; a cycle older than
+``resume_within`` is abandoned instead, so a stale broadcast is not
+completed hours late.
+
+Usage:
+    python delivery_ledger.py groups --since 7d
+    python delivery_ledger.py cycles --job hourly --limit 10
+"""
+
+import argparse
+import logging
+import sqlite3
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+import sqlite_store
+from sqlite_store import BatchedWriter, parse_time, print_table
+
+DEFAULT_LEDGER_PATH = "delivery_ledger.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cycles (
+    job TEXT NOT NULL,
+    cycle INTEGER NOT NULL,
+    started REAL NOT NULL,
+    finished REAL,
+    groups INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'running',
+    PRIMARY KEY (job, cycle)
+);
+CREATE TABLE IF NOT EXISTS deliveries (
+    job TEXT NOT NULL,
+    cycle INTEGER NOT NULL,
+    grp TEXT NOT NULL,
+    message_id INTEGER,
+    status TEXT NOT NULL,
+    ts REAL NOT NULL,
+    latency REAL,
+    PRIMARY KEY (job, cycle, grp)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_deliveries_ts ON deliveries (ts, job, grp, status, latency);
+"""
+
+# A later attempt in a resumed cycle replaces the earlier failure.
+UPSERT = (
+    "INSERT OR REPLACE INTO deliveries (job, cycle, grp, message_id, status, ts, latency)"
+    " VALUES (?, ?, ?, ?, ?, ?, ?)"
+)
+
+
+def connect(path: str) -> sqlite3.Connection:
+    return sqlite_store.connect(path, SCHEMA)
+
+
+class DeliveryLedger:
+    """Records delivery outcomes and the cycles they belong to."""
+
+    def __init__(
+        self,
+        path: Optional[str] = DEFAULT_LEDGER_PATH,
+        batch_size: int = 20,
+        resume_within: float = 3600,
+    ):
+        self.path = path
+        self.resume_within = resume_within
+        self._writer = BatchedWriter(path, SCHEMA, UPSERT, batch_size, "delivery-ledger")
+        # Cycle numbers when there is no database (path=None).
+        self._cycles: Dict[str, int] = {}
+
+    @property
+    def written(self) -> int:
+        return self._writer.written
+
+    def open(self) -> None:
+        self._writer.open()
+
+    def _next_in_memory(self, job: str) -> Tuple[int, Set[str]]:
+        cycle = self._cycles[job] = self._cycles.get(job, 0) + 1
+        return cycle, set()
+
+    def _begin(self, connection: sqlite3.Connection, job: str, groups: int, now: float) -> Tuple[int, Set[str]]:
+        with connection:
+            last = connection.execute(
+                "SELECT cycle, started, finished FROM cycles WHERE job = ? ORDER BY cycle DESC LIMIT 1", (job,)
+            ).fetchone()
+            if last is not None and last[2] is None:
+                cycle, started, _ = last
+                if now - started <= self.resume_within:
+                    delivered = {
+                        group for (group,) in connection.execute(
+                            "SELECT grp FROM deliveries WHERE job = ? AND cycle = ? AND status = 'sent'",
+                            (job, cycle),
+                        )
+                    }
+                    return cycle, delivered
+                connection.execute(
+                    "UPDATE cycles SET finished = ?, status = 'abandoned' WHERE job = ? AND cycle = ?",
+                    (now, job, cycle),
+                )
+            cycle = (last[0] if last is not None else 0) + 1
+            connection.execute(
+                "INSERT INTO cycles (job, cycle, started, groups) VALUES (?, ?, ?, ?)", (job, cycle, now, groups)
+            )
+        return cycle, set()
+
+    async def begin_cycle(self, job: str, groups: int) -> Tuple[int, Set[str]]:
+        """Start (or resume) ``job``'s cycle; returns its number and the groups already served."""
+        if not self._writer.enabled:
+            return self._next_in_memory(job)
+        await self._writer.flush()
+        try:
+            cycle, delivered = await self._writer.run(self._begin, job, groups, time.time())
+        except sqlite3.Error as exc:
+            logging.warning("Delivery ledger unavailable for %s: %s", job, exc)
+            return self._next_in_memory(job)
+        if delivered:
+            logging.info(
+                "♻️  Resuming %s cycle #%s: %s of %s groups already delivered", job, cycle, len(delivered), groups
+            )
+        return cycle, delivered
+
+    async def record(
+        self,
+        job: str,
+        cycle: int,
+        group: str,
+        message_id: Optional[int],
+        status: str,
+        latency: Optional[float] = None,
+    ) -> None:
+        """Log one delivery outcome.
+
+        A ``sent`` row is committed before this returns (concurrent sends
+        share one commit), so a restart never repeats a recorded delivery.
+        Other outcomes are only batched.
+        """
+        self._writer.add((job, cycle, group, message_id, status, time.time(), latency))
+        if status == "sent":
+            await self._writer.flush()
+
+    def _finish(self, connection: sqlite3.Connection, job: str, cycle: int, now: float) -> None:
+        with connection:
+            connection.execute(
+                "UPDATE cycles SET finished = ?, status = 'done' WHERE job = ? AND cycle = ?", (now, job, cycle)
+            )
+
+    async def finish_cycle(self, job: str, cycle: int) -> None:
+        """Commit the cycle's deliveries and mark it complete."""
+        if not self._writer.enabled:
+            return
+        await self._writer.flush()
+        try:
+            await self._writer.run(self._finish, job, cycle, time.time())
+        except sqlite3.Error as exc:
+            logging.warning("Failed to close %s cycle #%s in the ledger: %s", job, cycle, exc)
+
+    async def run_flush(self, interval: float = 1) -> None:
+        """Commit batched outcomes every ``interval`` seconds, or sooner once full."""
+        await self._writer.run_flush(interval)
+
+    async def close(self) -> None:
+        await self._writer.close()
+
+
+def _filters(args) -> Tuple[str, list]:
+    clauses, params = ["ts >= ?"], [parse_time(args.since)]
+    if args.until:
+        clauses.append("ts < ?")
+        params.append(parse_time(args.until))
+    if args.job:
+        clauses.append("job = ?")
+        params.append(args.job)
+    return " AND ".join(clauses), params
+
+
+def query_groups(connection: sqlite3.Connection, args) -> Tuple[List[str], list]:
+    where, params = _filters(args)
+    rows = connection.execute(
+        f"SELECT grp, SUM(status = 'sent'), SUM(status != 'sent'),"
+        f" 100.0 * SUM(status = 'sent') / COUNT(*),"
+        f" 1000 * AVG(CASE WHEN status = 'sent' THEN latency END),"
+        f" 1000 * MAX(CASE WHEN status = 'sent' THEN latency END)"
+        f" FROM deliveries WHERE {where} GROUP BY grp ORDER BY 4, 5 DESC LIMIT ?",
+        params + [args.limit],
+    ).fetchall()
+    return ["group", "sent", "failed", "success %", "avg ms", "max ms"], rows
+
+
+def query_cycles(connection: sqlite3.Connection, args) -> Tuple[List[str], list]:
+    clauses, params = ["c.started >= ?"], [parse_time(args.since)]
+    if args.until:
+        clauses.append("c.started < ?")
+        params.append(parse_time(args.until))
+    if args.job:
+        clauses.append("c.job = ?")
+        params.append(args.job)
+    rows = connection.execute(
+        f"SELECT c.job, c.cycle, datetime(c.started, 'unixepoch'), c.status, c.groups,"
+        f" SUM(d.status = 'sent'), SUM(d.status != 'sent'), c.finished - c.started"
+        f" FROM cycles c LEFT JOIN deliveries d ON d.job = c.job AND d.cycle = c.cycle"
+        f" WHERE {' AND '.join(clauses)} GROUP BY c.job, c.cycle ORDER BY c.started DESC LIMIT ?",
+        params + [args.limit],
+    ).fetchall()
+    return ["job", "cycle", "started (UTC)", "status", "groups", "sent", "failed", "seconds"], rows
+
+
+QUERIES = {"groups": query_groups, "cycles": query_cycles}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Query the group senders' delivery ledger.")
+    parser.add_argument("query", choices=sorted(QUERIES))
+    parser.add_argument("--db", default=DEFAULT_LEDGER_PATH, help="ledger database path")
+    parser.add_argument("--since", default="7d", help='start, e.g. "24h", "7d" or "2024-05-01"')
+    parser.add_argument("--until", help="end (exclusive), same formats as --since")
+    parser.add_argument("--job", help="only this job")
+    parser.add_argument("--limit", type=int, default=50, help="rows to show")
+    args = parser.parse_args(argv)
+
+    connection = connect(args.db)
+    started = time.perf_counter()
+    headers, rows = QUERIES[args.query](connection, args)
+    elapsed = time.perf_counter() - started
+    connection.close()
+
+    print_table(headers, rows)
+    print(f"\n{len(rows)} rows in {elapsed * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
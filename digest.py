@@ -0,0 +1,144 @@
+"""
+Time-window digest mode for the rain monitor.
+
+Instead of one post per alert, alerts bound for the same target within a
+window are merged into a single post grouped by country with summed user
+counts. A digest is flushed early when adding another alert would push it
+past Telegram's message length limit.
+"""
+
+import asyncio
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from message_chunks import TELEGRAM_MESSAGE_LIMIT, fit_line, utf16_len
+
+
+class DigestEntry(NamedTuple):
+    country: str
+    flag: str
+    user_count: int
+    line: str
+    on_failure: Optional[Callable[[Exception], None]] = None
+
+
+def _plural(count: int, noun: str) -> str:
+    return f"{count} {noun}" if count == 1 else f"{count} {noun}s"
+
+
+def digest_header(count: int) -> str:
+    return f"🌧 RAIN DIGEST — {_plural(count, 'alert')}"
+
+
+def group_header(country: str, flag: str, rains: int, users: int) -> str:
+    return f"{flag} <b>{country.upper()}</b> — {_plural(rains, 'rain')} · 👥 {_plural(users, 'user')}"
+
+
+def bullet(entry: DigestEntry) -> str:
+    return f"   • {entry.line}"
+
+
+def render_digest(entries: List[DigestEntry]) -> str:
+    """Render entries as one post, grouped by country in first-seen order."""
+    groups: Dict[Tuple[str, str], List[DigestEntry]] = {}
+    for entry in entries:
+        groups.setdefault((entry.country, entry.flag), []).append(entry)
+
+    lines = [digest_header(len(entries))]
+    for (country, flag), items in groups.items():
+        users = sum(item.user_count for item in items)
+        lines.append("")
+        lines.append(group_header(country, flag, len(items), users))
+        lines.extend(bullet(item) for item in items)
+    return "\n".join(lines)
+
+
+class PendingDigest:
+    """Entries waiting for one target, with the rendered post's length kept current.
+
+    ``length`` always equals ``utf16_len(render_digest(entries))``, so adding
+    an alert costs O(1) instead of re-rendering the whole digest.
+    """
+
+    __slots__ = ("entries", "groups", "length")
+
+    def __init__(self):
+        self.entries: List[DigestEntry] = []
+        # (country, flag) -> [rains, users, header length]
+        self.groups: Dict[Tuple[str, str], List[int]] = {}
+        self.length = utf16_len(digest_header(0))
+
+    def _grown(self, entry: DigestEntry) -> Tuple[int, int, int, int]:
+        """Return (length, rains, users, header length) once ``entry`` is added."""
+        count = len(self.entries)
+        length = self.length - utf16_len(digest_header(count)) + utf16_len(digest_header(count + 1))
+        # Each bullet adds its line plus the newline before it.
+        length += 1 + utf16_len(bullet(entry))
+        rains, users, old_header = self.groups.get((entry.country, entry.flag), (0, 0, 0))
+        rains += 1
+        users += entry.user_count
+        header = utf16_len(group_header(entry.country, entry.flag, rains, users))
+        if rains == 1:
+            # A new group adds a blank line and its header, each after a newline.
+            length += 2
+        return length - old_header + header, rains, users, header
+
+    def length_with(self, entry: DigestEntry) -> int:
+        return self._grown(entry)[0]
+
+    def add(self, entry: DigestEntry) -> None:
+        self.length, rains, users, header = self._grown(entry)
+        self.groups[(entry.country, entry.flag)] = [rains, users, header]
+        self.entries.append(entry)
+
+
+# target, text, on_failure -> whether the post was accepted for sending
+Emitter = Callable[[Any, str, Callable[[Exception], None]], bool]
+
+
+class DigestBuffer:
+    """Collects alerts per target and emits one merged post per window."""
+
+    def __init__(self, window_seconds: float, emit: Emitter, max_chars: int = TELEGRAM_MESSAGE_LIMIT):
+        self.window_seconds = window_seconds
+        self.emit = emit
+        self.max_chars = max_chars
+        self._pending: Dict[Any, PendingDigest] = {}
+        self._timers: Dict[Any, asyncio.TimerHandle] = {}
+        self.posts = 0
+        self.alerts = 0
+
+    def add(self, target, entry: DigestEntry) -> None:
+        if utf16_len(entry.line) > self.max_chars // 2:
+            entry = entry._replace(line=fit_line(entry.line, self.max_chars // 2))
+        pending = self._pending.get(target)
+        if pending is not None and pending.length_with(entry) > self.max_chars:
+            self.flush(target)
+            pending = None
+        if pending is None:
+            pending = self._pending[target] = PendingDigest()
+            loop = asyncio.get_running_loop()
+            self._timers[target] = loop.call_later(self.window_seconds, self.flush, target)
+        pending.add(entry)
+        self.alerts += 1
+
+    def flush(self, target) -> None:
+        timer = self._timers.pop(target, None)
+        if timer is not None:
+            timer.cancel()
+        pending = self._pending.pop(target, None)
+        if pending is None or not pending.entries:
+            return
+        entries = pending.entries
+
+        def on_failure(exc: Exception) -> None:
+            for entry in entries:
+                if entry.on_failure is not None:
+                    entry.on_failure(exc)
+
+        self.posts += 1
+        if not self.emit(target, render_digest(entries), on_failure):
+            on_failure(RuntimeError("outbound queue rejected digest"))
+
+    def flush_all(self) -> None:
+        for target in list(self._pending):
+            self.flush(target)
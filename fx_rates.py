@@ -0,0 +1,239 @@
+"""
+Background FX and crypto rate service for the rain monitor.
+
+One fetch of open.er-api.com fills a table with every fiat rate, optionally
+alongside coin prices from CoinGecko. Both are refreshed together by an
+asyncio task before the cache expires, over keep-alive HTTPS connections
+driven from a worker thread, so lookups on the event loop only read the
+cached table.
+"""
+
+import asyncio
+import http.client
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Mapping, Optional
+from urllib.parse import urlencode
+
+FX_HOST = "open.er-api.com"
+FX_PATH = "/v6/latest/USD"
+CRYPTO_HOST = "api.coingecko.com"
+CRYPTO_PATH = "/api/v3/simple/price"
+FALLBACK_USD_INR_RATE = 91.0
+
+# Coin tickers seen in rain posts -> CoinGecko ids.
+DEFAULT_CRYPTO_IDS = {
+    "BNB": "binancecoin",
+    "BTC": "bitcoin",
+    "DOGE": "dogecoin",
+    "ETH": "ethereum",
+    "LTC": "litecoin",
+    "SOL": "solana",
+    "TON": "the-open-network",
+    "TRX": "tron",
+    "USDC": "usd-coin",
+    "USDT": "tether",
+    "XRP": "ripple",
+}
+
+# Stablecoins are close enough to $1 to convert even without a price feed.
+CRYPTO_PEGS = {"USDT": 1.0, "USDC": 1.0}
+
+
+class RateTable:
+    """Snapshot of fiat rates (units per USD) and coin prices (in USD)."""
+
+    __slots__ = ("fiat", "crypto", "fetched_at", "version")
+
+    def __init__(
+        self,
+        fiat: Mapping[str, float],
+        crypto: Optional[Mapping[str, float]] = None,
+        fetched_at: float = 0.0,
+        version: int = 0,
+    ):
+        self.fiat = {"USD": 1.0, **fiat}
+        self.crypto = {**CRYPTO_PEGS, **(crypto or {})}
+        self.fetched_at = fetched_at
+        self.version = version
+
+    def usd_value(self, amount: float, code: str) -> Optional[float]:
+        """Value of ``amount`` units of ``code`` in USD, or None if unknown."""
+        code = code.upper()
+        per_usd = self.fiat.get(code)
+        if per_usd:
+            return amount / per_usd
+        price = self.crypto.get(code)
+        if price is not None:
+            return amount * price
+        return None
+
+    def convert(self, amount: float, code: str, target: str = "INR") -> Optional[float]:
+        usd = self.usd_value(amount, code)
+        per_usd = self.fiat.get(target.upper())
+        if usd is None or not per_usd:
+            return None
+        return usd * per_usd
+
+
+FALLBACK_TABLE = RateTable({"INR": FALLBACK_USD_INR_RATE})
+
+
+class FxRateService:
+    """Serves the cached rate table and keeps it fresh in the background."""
+
+    def __init__(
+        self,
+        ttl_seconds: float = 300,
+        refresh_ratio: float = 0.8,
+        timeout: float = 5,
+        retry_seconds: float = 30,
+        crypto_ids: Optional[Mapping[str, str]] = None,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.refresh_interval = ttl_seconds * refresh_ratio
+        self.timeout = timeout
+        self.retry_seconds = retry_seconds
+        self.crypto_ids = dict(crypto_ids or {})
+        self.table = FALLBACK_TABLE
+        self._last_attempt = 0.0
+        self.hits = 0
+        self.misses = 0
+        self._connections: Dict[str, http.client.HTTPSConnection] = {}
+        # A single worker keeps every request on the same connections.
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="fx-rates")
+        self._task: Optional[asyncio.Task] = None
+        self._refreshing: Optional[asyncio.Future] = None
+
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def install(self, table: RateTable) -> None:
+        """Swap in a new table; lookups see either the old or the new one."""
+        self.table = table
+
+    def is_stale(self, now: Optional[float] = None) -> bool:
+        now = time.time() if now is None else now
+        return (now - self.table.fetched_at) >= self.ttl_seconds
+
+    def get_table(self) -> RateTable:
+        """Return the cached table without waiting; revalidate if it is stale."""
+        if self.is_stale():
+            self.misses += 1
+            self._schedule_refresh()
+        else:
+            self.hits += 1
+        return self.table
+
+    def get_rate(self) -> float:
+        """Cached USD->INR rate."""
+        return self.get_table().fiat.get("INR", FALLBACK_USD_INR_RATE)
+
+    def _schedule_refresh(self) -> None:
+        if self._refreshing is not None and not self._refreshing.done():
+            return
+        if time.time() - self._last_attempt < self.retry_seconds:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._refreshing = loop.create_task(self.refresh())
+
+    async def refresh(self) -> bool:
+        """Fetch fresh fiat (and coin) rates off the event loop and swap them in."""
+        loop = asyncio.get_running_loop()
+        self._last_attempt = time.time()
+        try:
+            fiat = await loop.run_in_executor(self._executor, self._fetch_fiat)
+        except (OSError, http.client.HTTPException, ValueError) as exc:
+            logging.warning("Failed to refresh FX rates, serving cached values: %s", exc)
+            return False
+
+        crypto = {code: price for code, price in self.table.crypto.items() if code not in CRYPTO_PEGS}
+        if self.crypto_ids:
+            try:
+                crypto = await loop.run_in_executor(self._executor, self._fetch_crypto)
+            except (OSError, http.client.HTTPException, ValueError) as exc:
+                logging.warning("Failed to refresh coin prices, keeping previous ones: %s", exc)
+
+        self.install(RateTable(fiat, crypto, time.time(), self.table.version + 1))
+        return True
+
+    def _fetch_fiat(self) -> Dict[str, float]:
+        payload = self._request_json(FX_HOST, FX_PATH)
+        rates = {
+            code.upper(): float(rate)
+            for code, rate in payload.get("rates", {}).items()
+            if isinstance(rate, (int, float)) and rate > 0
+        }
+        if "INR" not in rates:
+            raise ValueError("FX payload has no INR rate")
+        return rates
+
+    def _fetch_crypto(self) -> Dict[str, float]:
+        query = urlencode({"ids": ",".join(sorted(set(self.crypto_ids.values()))), "vs_currencies": "usd"})
+        payload = self._request_json(CRYPTO_HOST, f"{CRYPTO_PATH}?{query}")
+        prices = {}
+        for ticker, coin_id in self.crypto_ids.items():
+            price = payload.get(coin_id, {}).get("usd")
+            if isinstance(price, (int, float)) and price > 0:
+                prices[ticker.upper()] = float(price)
+        return prices
+
+    def _request_json(self, host: str, path: str) -> dict:
+        for attempt in range(2):
+            connection = self._connections.get(host)
+            if connection is None:
+                connection = self._connections[host] = http.client.HTTPSConnection(host, timeout=self.timeout)
+            try:
+                connection.request(
+                    "GET", path, headers={"Connection": "keep-alive", "Accept": "application/json"}
+                )
+                response = connection.getresponse()
+                body = response.read()
+                if response.status != 200:
+                    raise ValueError(f"{host} returned HTTP {response.status}")
+                return json.loads(body.decode("utf-8"))
+            except (OSError, http.client.HTTPException):
+                # The server may have closed the idle connection; reconnect once.
+                self._close_connection(host)
+                if attempt:
+                    raise
+        raise http.client.HTTPException(f"Request to {host} failed")
+
+    def _close_connection(self, host: str) -> None:
+        connection = self._connections.pop(host, None)
+        if connection is not None:
+            connection.close()
+
+    def _close_connections(self) -> None:
+        for host in list(self._connections):
+            self._close_connection(host)
+
+    async def _run(self) -> None:
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self) -> None:
+        """Start the background refresh loop on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        # The refresh loop and any on-demand refresh a stale lookup started.
+        for task in (self._task, self._refreshing):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._task = self._refreshing = None
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self._close_connections)
+        self._executor.shutdown(wait=False)
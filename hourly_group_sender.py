@@ -1,27 +1,38 @@
 """
 Telegram Userbot for Hourly Group Messaging
 Sends scheduled messages to 7-8 groups every hour
+
+Thin entry point over broadcast_engine: the groups, templates and schedule
+come from the environment (or from a JOBS_FILE for several jobs).
 """
 
 import asyncio
+import json
 import logging
 import os
-from datetime import datetime
-from typing import List, Dict
-import random
+from typing import List
+
+from telethon import TelegramClient
 
-from telethon import TelegramClient, functions
-from telethon.errors import RPCError, FloodWaitError
-from telethon.tl.types import Channel, Chat
+from broadcast_engine import (
+    BroadcastEngine,
+    JobConfig,
+    account_budget,
+    jobs_from_mapping,
+    load_account_budget,
+    load_jobs,
+    parse_groups,
+)
+from delivery_ledger import DEFAULT_LEDGER_PATH, DeliveryLedger
+from log_setup import setup_logging
+from peer_cache import DEFAULT_PEER_CACHE_PATH, PeerCache
+from templates import RotationState
 
-# Configure logging
-logging.basicConfig(
+# Configure logging (queued; a background thread writes userbot.log)
+setup_logging(
     level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(message)s",
-    handlers=[
-        logging.FileHandler("userbot.log"),
-        logging.StreamHandler()
-    ]
+    log_file="userbot.log",
+    fmt="%(asctime)s [%(levelname)s] %(message)s",
 )
 
 logger = logging.getLogger(__name__)
@@ -31,12 +42,24 @@ API_ID = os.getenv("API_ID")
 API_HASH = os.getenv("API_HASH")
 PHONE_NUMBER = os.getenv("PHONE_NUMBER")
 TARGET_GROUPS = os.getenv("TARGET_GROUPS", "")  # Comma-separated
+JOBS_FILE = os.getenv("JOBS_FILE", "")  # JSON jobs file; replaces TARGET_GROUPS and the settings below
+PEER_CACHE_PATH = os.getenv("PEER_CACHE_PATH", DEFAULT_PEER_CACHE_PATH)
+TEMPLATE_FILES = os.getenv("TEMPLATE_FILES", "")  # Comma-separated template files/globs; replace MESSAGE_TEMPLATES
+ROTATION_STATE_PATH = os.getenv("ROTATION_STATE_PATH", "rotation_state.json")  # Template rotation across restarts
+DELIVERY_LEDGER_PATH = os.getenv("DELIVERY_LEDGER_PATH", DEFAULT_LEDGER_PATH)  # Resume cycles after a crash
 
 # Timing configuration
 SEND_INTERVAL = 3600  # 1 hour in seconds
-DELAY_BETWEEN_GROUPS = 5  # Delay between each group message (seconds)
+SEND_SCHEDULE = os.getenv("SEND_SCHEDULE", str(SEND_INTERVAL))  # Seconds (clock-aligned) or cron expression
+GROUP_SCHEDULES = os.getenv("GROUP_SCHEDULES", "")  # JSON {"group": "*/30 * * * *"} per-group overrides
+SCHEDULE_SPREAD = float(os.getenv("SCHEDULE_SPREAD", "0"))  # Spread schedules over this many seconds
+BROADCAST_CONCURRENCY = int(os.getenv("BROADCAST_CONCURRENCY", "4"))  # Groups sent to in parallel
+BROADCAST_RATE = float(os.getenv("BROADCAST_RATE", "1.0"))  # Starting account-wide sends per second
+BROADCAST_MAX_RATE = float(os.getenv("BROADCAST_MAX_RATE", "2.0"))  # Ceiling the pace may ramp up to
+GROUP_MIN_INTERVAL = float(os.getenv("GROUP_MIN_INTERVAL", "60"))  # Min seconds between posts to one group
+SEND_JITTER = float(os.getenv("SEND_JITTER", "0.5"))  # Random extra spacing per send (seconds)
 
-# Multiple message templates to rotate
+# Multiple message templates to rotate (or keep them in files, see TEMPLATE_FILES)
 MESSAGE_TEMPLATES = [
     """
 🌟 Hourly Update 🌟
@@ -104,192 +127,87 @@ class HourlyGroupSender:
         self.api_hash = api_hash
         self.phone = phone
         self.client = None
-        self.target_groups = []
-        self.message_index = 0
+        self.jobs: List[JobConfig] = []
+        self.peers = PeerCache(PEER_CACHE_PATH or None)
+        self.rotation = RotationState(ROTATION_STATE_PATH or None)
+        self.ledger = DeliveryLedger(DELIVERY_LEDGER_PATH or None)
+        self.engine = None
         
     async def initialize(self):
         """Initialize Telegram client and verify connection"""
         try:
             self.client = TelegramClient('userbot_session', self.api_id, self.api_hash)
+            self.peers.load()
             await self.client.start(phone=self.phone)
+            await self.peers.attach(self.client)
             
             me = await self.client.get_me()
-            logger.info(f"✅ Connected as: {me.first_name} (@{me.username})")
-            logger.info(f"📱 Phone: {me.phone}")
+            logger.info("✅ Connected as: %s (@%s)", me.first_name, me.username)
+            logger.info("📱 Phone: %s", me.phone)
             
             return True
         except Exception as e:
-            logger.error(f"❌ Failed to initialize client: {e}")
+            logger.error("❌ Failed to initialize client: %s", e)
             return False
     
-    def load_target_groups(self):
-        """Load and validate target groups"""
-        groups_str = TARGET_GROUPS
-        if not groups_str:
-            logger.error("❌ No target groups specified in TARGET_GROUPS environment variable")
-            return False
-        
-        self.target_groups = [g.strip() for g in groups_str.split(",") if g.strip()]
-        
-        if not self.target_groups:
-            logger.error("❌ No valid groups found")
+    def load_jobs(self):
+        """Load jobs from JOBS_FILE, or build them from TARGET_GROUPS and the templates above"""
+        try:
+            if JOBS_FILE:
+                self.jobs = load_jobs(JOBS_FILE)
+                budget = load_account_budget(JOBS_FILE)
+            else:
+                # One budget for all jobs, even when several schedules fire together
+                budget = account_budget(BROADCAST_RATE, BROADCAST_MAX_RATE)
+                self.jobs = jobs_from_mapping(
+                    "hourly",
+                    parse_groups(TARGET_GROUPS),
+                    [] if TEMPLATE_FILES else MESSAGE_TEMPLATES,
+                    json.loads(GROUP_SCHEDULES) if GROUP_SCHEDULES else None,
+                    template_files=parse_groups(TEMPLATE_FILES),
+                    custom=CUSTOM_GROUP_MESSAGES,
+                    schedule=SEND_SCHEDULE,
+                    concurrency=BROADCAST_CONCURRENCY,
+                    rate=BROADCAST_RATE,
+                    max_rate=BROADCAST_MAX_RATE,
+                    group_interval=GROUP_MIN_INTERVAL,
+                    jitter=SEND_JITTER,
+                )
+        except (OSError, ValueError) as e:
+            logger.error("❌ Invalid job configuration: %s", e)
             return False
         
-        logger.info(f"📋 Loaded {len(self.target_groups)} target groups:")
-        for i, group in enumerate(self.target_groups, 1):
-            logger.info(f"   {i}. {group}")
+        for job in self.jobs:
+            logger.info("📋 Job %s: %s target groups", job.name, len(job.groups))
+            for i, group in enumerate(job.groups, 1):
+                logger.info("   %s. %s", i, group)
         
+        self.rotation.load()
+        self.ledger.open()
+        self.engine = BroadcastEngine(
+            self.client, self.jobs, self.peers, account_pacing=budget, rotation=self.rotation, ledger=self.ledger
+        )
         return True
     
     async def verify_groups(self):
         """Verify access to all groups and join if needed"""
-        verified_groups = []
-        
-        for group_identifier in self.target_groups:
-            try:
-                # Check if it's an invite link
-                if "t.me/+" in group_identifier or "t.me/joinchat/" in group_identifier:
-                    entity = await self.join_via_invite_link(group_identifier)
-                else:
-                    # Try to get entity by username or ID
-                    entity = await self.client.get_entity(group_identifier)
-                
-                if entity:
-                    group_name = getattr(entity, 'title', group_identifier)
-                    logger.info(f"✅ Verified access to: {group_name}")
-                    verified_groups.append((group_identifier, entity))
-                    
-            except Exception as e:
-                logger.error(f"❌ Cannot access group '{group_identifier}': {e}")
-        
-        if not verified_groups:
+        if not await self.engine.verify():
             logger.error("❌ No groups accessible. Cannot proceed.")
             return False
-        
-        self.target_groups = verified_groups
-        logger.info(f"✅ Successfully verified {len(self.target_groups)} groups")
         return True
     
-    async def join_via_invite_link(self, invite_link: str):
-        """Join a group via invite link"""
-        try:
-            hash_part = invite_link.split("/")[-1]
-            if hash_part.startswith("+"):
-                hash_part = hash_part[1:]
-            
-            result = await self.client(functions.messages.ImportChatInviteRequest(hash_part))
-            logger.info(f"✅ Joined group via invite link")
-            return result.chats[0] if result.chats else None
-            
-        except FloodWaitError as e:
-            logger.warning(f"⏰ Flood wait: Need to wait {e.seconds} seconds")
-            await asyncio.sleep(e.seconds)
-            return await self.join_via_invite_link(invite_link)
-        except Exception as e:
-            logger.debug(f"Note joining link: {e}")
-            # Might already be member, try to get entity
-            try:
-                return await self.client.get_entity(invite_link)
-            except:
-                raise
-    
-    def format_message(self, template: str) -> str:
-        """Format message with current timestamp"""
-        now = datetime.now()
-        timestamp = now.strftime("%Y-%m-%d %H:%M:%S")
-        return template.format(timestamp=timestamp)
-    
-    def get_next_message(self, group_identifier: str) -> str:
-        """Get next message template (rotates through templates)"""
-        # Check if there's a custom message for this group
-        if group_identifier in CUSTOM_GROUP_MESSAGES:
-            return self.format_message(CUSTOM_GROUP_MESSAGES[group_identifier])
-        
-        # Use rotating templates
-        template = MESSAGE_TEMPLATES[self.message_index % len(MESSAGE_TEMPLATES)]
-        return self.format_message(template)
-    
-    async def send_message_to_group(self, group_identifier, entity):
-        """Send message to a single group with error handling"""
-        try:
-            message = self.get_next_message(group_identifier)
-            await self.client.send_message(entity, message)
-            
-            group_name = getattr(entity, 'title', group_identifier)
-            logger.info(f"✅ Sent to: {group_name}")
-            return True
-            
-        except FloodWaitError as e:
-            logger.warning(f"⏰ Flood wait for {group_identifier}: {e.seconds} seconds")
-            await asyncio.sleep(e.seconds)
-            # Retry after wait
-            return await self.send_message_to_group(group_identifier, entity)
-            
-        except RPCError as e:
-            logger.error(f"❌ RPC Error sending to {group_identifier}: {e}")
-            return False
-            
-        except Exception as e:
-            logger.error(f"❌ Unexpected error sending to {group_identifier}: {e}")
-            return False
-    
     async def send_to_all_groups(self):
-        """Send messages to all groups with delays"""
-        logger.info("=" * 60)
-        logger.info("📤 Starting message broadcast to all groups...")
-        
-        successful = 0
-        failed = 0
-        
-        for i, (group_identifier, entity) in enumerate(self.target_groups, 1):
-            logger.info(f"📨 Sending to group {i}/{len(self.target_groups)}...")
-            
-            success = await self.send_message_to_group(group_identifier, entity)
-            
-            if success:
-                successful += 1
-            else:
-                failed += 1
-            
-            # Add delay between messages to avoid flood
-            if i < len(self.target_groups):
-                logger.info(f"⏳ Waiting {DELAY_BETWEEN_GROUPS} seconds before next send...")
-                await asyncio.sleep(DELAY_BETWEEN_GROUPS)
-        
-        # Rotate to next message template
-        self.message_index += 1
-        
-        logger.info("=" * 60)
-        logger.info(f"✅ Broadcast complete: {successful} successful, {failed} failed")
-        logger.info(f"⏰ Next broadcast in {SEND_INTERVAL // 60} minutes")
-        logger.info("=" * 60)
+        """Send one broadcast for every job"""
+        return await self.engine.run_once()
     
     async def run_scheduler(self):
-        """Main scheduler loop - sends messages every hour"""
-        logger.info("🚀 Starting hourly scheduler...")
-        logger.info(f"⏱️  Interval: Every {SEND_INTERVAL // 60} minutes")
-        logger.info(f"📊 Target Groups: {len(self.target_groups)}")
-        
-        cycle = 0
-        
-        while True:
-            try:
-                cycle += 1
-                logger.info(f"\n🔄 Cycle #{cycle} - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-                
-                await self.send_to_all_groups()
-                
-                logger.info(f"\n💤 Sleeping for {SEND_INTERVAL // 60} minutes...\n")
-                await asyncio.sleep(SEND_INTERVAL)
-                
-            except KeyboardInterrupt:
-                logger.info("\n⏹️  Shutdown requested by user")
-                break
-                
-            except Exception as e:
-                logger.error(f"❌ Error in scheduler cycle: {e}")
-                logger.info(f"⏳ Waiting 60 seconds before retry...")
-                await asyncio.sleep(60)
+        """Main scheduler loop - every job now, then on its clock-aligned schedule"""
+        logger.info("🚀 Starting scheduler...")
+        flusher = asyncio.create_task(self.ledger.run_flush())
+        try:
+            await self.engine.run(SCHEDULE_SPREAD)
+        finally:
+            flusher.cancel()
     
     async def start(self):
         """Start the userbot"""
@@ -301,7 +219,7 @@ class HourlyGroupSender:
                 return False
             
             # Load target groups
-            if not self.load_target_groups():
+            if not self.load_jobs():
                 return False
             
             # Verify group access
@@ -316,8 +234,10 @@ class HourlyGroupSender:
         except KeyboardInterrupt:
             logger.info("\n👋 Userbot stopped by user")
         except Exception as e:
-            logger.error(f"❌ Fatal error: {e}")
+            logger.error("❌ Fatal error: %s", e)
         finally:
+            self.peers.save()
+            await self.ledger.close()
             if self.client:
                 await self.client.disconnect()
                 logger.info("🔌 Disconnected from Telegram")
@@ -336,9 +256,9 @@ async def main():
         logger.info("📝 Set your phone number with country code (e.g., +1234567890)")
         return
     
-    if not TARGET_GROUPS:
+    if not TARGET_GROUPS and not JOBS_FILE:
         logger.error("❌ Missing TARGET_GROUPS environment variable")
-        logger.info("📝 Set comma-separated group usernames or invite links")
+        logger.info("📝 Set comma-separated group usernames or invite links, or a JOBS_FILE")
         return
     
     # Create and start userbot
@@ -0,0 +1,115 @@
+"""
+Single-pass keyword classifier for rain alerts.
+
+All terms are compiled into one prefix-trie regex, so a message is scanned
+once no matter how many terms are configured, and the matched terms plus the
+resolved country context come back together in a single result.
+"""
+
+import re
+from typing import Dict, FrozenSet, Iterable, List, Mapping, NamedTuple, Optional, Tuple
+
+Context = Tuple[str, str, str]
+
+
+class KeywordMatch(NamedTuple):
+    """Result of classifying one message."""
+
+    terms: FrozenSet[str]
+    context: Context
+
+    def __bool__(self) -> bool:
+        return bool(self.terms)
+
+
+def _normalize(term: str) -> str:
+    return " ".join(term.lower().split())
+
+
+def _trie_pattern(terms: Iterable[str]) -> str:
+    """Build an alternation regex that shares common prefixes between terms."""
+    trie: Dict[str, dict] = {}
+    for term in terms:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def render(node: Dict[str, dict]) -> str:
+        optional = "" in node
+        branches = []
+        for char in sorted(key for key in node if key):
+            atom = r"\s+" if char == " " else re.escape(char)
+            branches.append(atom + render(node[char]))
+        if not branches:
+            return ""
+        if len(branches) == 1 and not optional:
+            return branches[0]
+        body = "(?:" + "|".join(branches) + ")"
+        return body + "?" if optional else body
+
+    return render(trie)
+
+
+class KeywordClassifier:
+    """Matches every configured term and resolves its context in one scan."""
+
+    def __init__(
+        self,
+        terms: Iterable[str],
+        context: Mapping[str, Context],
+        default_context: Context,
+    ):
+        ordered: List[str] = []
+        for term in terms:
+            normalized = _normalize(term)
+            if normalized and normalized not in ordered:
+                ordered.append(normalized)
+
+        self.terms: Tuple[str, ...] = tuple(ordered)
+        self.default_context = default_context
+        self._context = {_normalize(term): value for term, value in context.items()}
+        self._rank = {term: index for index, term in enumerate(self.terms)}
+        self.pattern: Optional[re.Pattern] = None
+        if self.terms:
+            self.pattern = re.compile(
+                r"\b(?:" + _trie_pattern(self.terms) + r")\b",
+                re.IGNORECASE,
+            )
+
+        # A hit on a multi-word term also counts as a hit on every shorter
+        # term it contains, matching what separate per-term searches reported.
+        self._implied: Dict[str, FrozenSet[str]] = {}
+        for term in self.terms:
+            self._implied[term] = frozenset(
+                other for other in self.terms
+                if other == term or re.search(r"\b" + re.escape(other) + r"\b", term)
+            )
+
+    def classify(self, text: str) -> KeywordMatch:
+        """Return the matched terms and resolved context for ``text``."""
+        if self.pattern is None or not text:
+            return KeywordMatch(frozenset(), self.default_context)
+
+        found = {_normalize(match.group(0)) for match in self.pattern.finditer(text)}
+        if not found:
+            return KeywordMatch(frozenset(), self.default_context)
+
+        terms = set()
+        for key in found:
+            terms |= self._implied.get(key, {key})
+        return KeywordMatch(frozenset(terms), self.resolve(terms))
+
+    def resolve(self, terms: Iterable[str]) -> Context:
+        """Pick the context of the earliest configured term that has one."""
+        best_rank = None
+        best_context = self.default_context
+        for term in terms:
+            context = self._context.get(term.lower())
+            if context is None:
+                continue
+            rank = self._rank.get(term.lower(), len(self._rank))
+            if best_rank is None or rank < best_rank:
+                best_rank = rank
+                best_context = context
+        return best_context
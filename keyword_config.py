@@ -0,0 +1,148 @@
+"""
+Hot-reloadable keyword, context and amount-pattern configuration.
+
+The monitor's terms, KEYWORD_CONTEXT and currency patterns can be
+overridden from a JSON file, for example::
+
+    {
+      "terms": ["nigeria", "hausa", "urdu"],
+      "context": {"nigeria": ["Nigeria", "🇳🇬", "Nigeria Users"]},
+      "default_context": ["Nigeria", "🇳🇬", "Nigeria Users"],
+      "currency_patterns": ["(₦\\\\s?\\\\d[\\\\d,]*)"]
+    }
+
+Keys left out keep their built-in defaults. The file is polled for changes;
+a new version is parsed and compiled in a worker thread and then swapped in
+with a single assignment, so the hot path always reads fully compiled
+patterns and never pays a compile cost.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import re
+from typing import Any, Dict, Iterable, Mapping, Optional, Tuple
+
+from keyword_classifier import Context, KeywordClassifier
+from rain_parser import RainParser
+
+# Everything a malformed config file can raise while being read and compiled.
+CONFIG_ERRORS = (OSError, ValueError, KeyError, TypeError, AttributeError, re.error)
+
+
+class CompiledKeywordConfig:
+    """One immutable, fully compiled version of the keyword configuration."""
+
+    __slots__ = ("version", "classifier", "parser", "settings")
+
+    def __init__(self, settings: Mapping[str, Any], version: int = 0):
+        self.version = version
+        self.settings = dict(settings)
+        context: Dict[str, Context] = {
+            term: tuple(value) for term, value in settings["context"].items()
+        }
+        self.classifier = KeywordClassifier(
+            settings["terms"], context, tuple(settings["default_context"])
+        )
+        self.parser = RainParser(settings["currency_patterns"])
+
+
+def _is_string_list(value: Any) -> bool:
+    # A bare string is iterable too, but would split into one-letter terms.
+    return isinstance(value, (list, tuple)) and all(isinstance(item, str) for item in value)
+
+
+def _is_context(value: Any) -> bool:
+    return _is_string_list(value) and len(value) == 3
+
+
+def validate_settings(settings: Mapping[str, Any]) -> None:
+    for key in ("terms", "currency_patterns"):
+        if not _is_string_list(settings[key]):
+            raise ValueError(f"'{key}' must be a list of strings")
+    if not isinstance(settings["context"], Mapping):
+        raise ValueError("'context' must map terms to [country, flag, audience]")
+    for term, value in settings["context"].items():
+        if not _is_context(value):
+            raise ValueError(f"Context for {term!r} needs [country, flag, audience]")
+    if not _is_context(settings["default_context"]):
+        raise ValueError("'default_context' needs [country, flag, audience]")
+    for pattern in settings["currency_patterns"]:
+        re.compile(pattern)
+
+
+def merge_settings(defaults: Mapping[str, Any], overrides: Mapping[str, Any]) -> Dict[str, Any]:
+    if not isinstance(overrides, Mapping):
+        raise ValueError("Keyword config must be a JSON object")
+    unknown = set(overrides) - set(defaults)
+    if unknown:
+        raise ValueError(f"Unknown keyword config keys: {', '.join(sorted(unknown))}")
+    merged = dict(defaults)
+    merged.update(overrides)
+    validate_settings(merged)
+    return merged
+
+
+def pattern_sources(patterns: Iterable[Any]) -> list:
+    return [pattern.pattern if isinstance(pattern, re.Pattern) else pattern for pattern in patterns]
+
+
+class KeywordConfigWatcher:
+    """Holds the active config and reloads it when the JSON file changes."""
+
+    def __init__(self, path: Optional[str], defaults: Mapping[str, Any], interval: float = 5):
+        self.path = path
+        self.defaults = dict(defaults)
+        self.interval = interval
+        self.current = CompiledKeywordConfig(self.defaults, version=0)
+        self._signature: Optional[Tuple[int, int]] = None
+
+    def _file_signature(self) -> Optional[Tuple[int, int]]:
+        if self.path is None:
+            return None
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _compile(self, version: int) -> CompiledKeywordConfig:
+        overrides: Dict[str, Any] = {}
+        if self.path is not None and os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as handle:
+                overrides = json.load(handle)
+        return CompiledKeywordConfig(merge_settings(self.defaults, overrides), version)
+
+    def load(self) -> CompiledKeywordConfig:
+        """Synchronously load the file at startup; errors keep the defaults."""
+        self._signature = self._file_signature()
+        try:
+            self.current = self._compile(self.current.version + 1)
+        except CONFIG_ERRORS as exc:
+            logging.error("Invalid keyword config %s, using built-in defaults: %s", self.path, exc)
+        return self.current
+
+    async def reload_if_changed(self) -> bool:
+        signature = self._file_signature()
+        if signature == self._signature:
+            return False
+        self._signature = signature
+        loop = asyncio.get_running_loop()
+        try:
+            compiled = await loop.run_in_executor(None, self._compile, self.current.version + 1)
+        except CONFIG_ERRORS as exc:
+            logging.error("Keeping keyword config v%s; reload failed: %s", self.current.version, exc)
+            return False
+        self.current = compiled
+        logging.warning("Loaded keyword config v%s from %s", compiled.version, self.path)
+        return True
+
+    async def watch(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.reload_if_changed()
+            except Exception:
+                # Never let one bad reload stop watching for the next fix.
+                logging.exception("Keyword config reload failed; still watching %s", self.path)
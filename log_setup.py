@@ -0,0 +1,130 @@
+"""
+Shared, non-blocking logging setup for the monitor and the group senders.
+
+Log calls on the event loop only put the record on an in-memory queue; a
+background listener thread formats it and writes it to the console and a
+rotating log file. Records are queued unformatted, so the cost of building
+the message (and of the disk write) is paid off the loop, and messages that
+are filtered out by level are never formatted at all. Use %-style arguments
+(``logger.info("Sent to %s", name)``) rather than f-strings so that stays true.
+
+Environment overrides:
+    LOG_LEVEL         DEBUG / INFO / WARNING ...
+    LOG_FILE          log file path (empty disables the file)
+    LOG_JSON          1 to write the file as JSON lines
+    LOG_MAX_BYTES     rotate once the file reaches this size (default 10 MB)
+    LOG_BACKUP_COUNT  rotated files to keep (default 5)
+    LOG_ROTATE_WHEN   rotate by time instead, e.g. "midnight" or "H"
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+from datetime import datetime, timezone
+from typing import List, Optional
+
+LOG_LEVEL_ENV = "LOG_LEVEL"
+LOG_FILE_ENV = "LOG_FILE"
+LOG_JSON_ENV = "LOG_JSON"
+LOG_MAX_BYTES_ENV = "LOG_MAX_BYTES"
+LOG_BACKUP_COUNT_ENV = "LOG_BACKUP_COUNT"
+LOG_ROTATE_WHEN_ENV = "LOG_ROTATE_WHEN"
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """One JSON object per record, for log shippers and jq."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread.
+
+    The stock handler formats every record before queueing it, which would
+    put the formatting cost right back on the caller.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def _file_handler(path: str, json_lines: bool, fmt: str) -> logging.Handler:
+    when = os.getenv(LOG_ROTATE_WHEN_ENV)
+    backup_count = int(os.getenv(LOG_BACKUP_COUNT_ENV, "5"))
+    if when:
+        handler: logging.Handler = logging.handlers.TimedRotatingFileHandler(
+            path, when=when, backupCount=backup_count, encoding="utf-8"
+        )
+    else:
+        handler = logging.handlers.RotatingFileHandler(
+            path,
+            maxBytes=int(os.getenv(LOG_MAX_BYTES_ENV, str(10 * 1024 * 1024))),
+            backupCount=backup_count,
+            encoding="utf-8",
+        )
+    handler.setFormatter(JsonLinesFormatter() if json_lines else logging.Formatter(fmt))
+    return handler
+
+
+def setup_logging(
+    level: int = logging.INFO,
+    log_file: Optional[str] = None,
+    fmt: str = "%(asctime)s %(levelname)s %(message)s",
+    console: bool = True,
+) -> logging.handlers.QueueListener:
+    """Route the root logger through a queue to a background writer thread.
+
+    Safe to call more than once; later calls replace the earlier setup.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+
+    level = os.getenv(LOG_LEVEL_ENV, "").upper() or level
+    log_file = os.getenv(LOG_FILE_ENV, log_file)
+    json_lines = os.getenv(LOG_JSON_ENV, "") not in ("", "0", "false")
+
+    handlers: List[logging.Handler] = []
+    if console:
+        stream = logging.StreamHandler()
+        stream.setFormatter(logging.Formatter(fmt))
+        handlers.append(stream)
+    if log_file:
+        handlers.append(_file_handler(log_file, json_lines, fmt))
+
+    records: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(DeferredQueueHandler(records))
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(records, *handlers, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(shutdown_logging)
@@ -0,0 +1,75 @@
+"""
+Length-aware streaming renderer for Telegram posts.
+
+Long alerts (a rain to a thousand users) are produced as a lazy sequence of
+chunks that each fit Telegram's message limit, instead of one joined string
+that the API would reject. Lengths are measured in UTF-16 code units of the
+escaped HTML, which is never less than what Telegram counts after parsing.
+"""
+
+from typing import Iterable, Iterator
+
+TELEGRAM_MESSAGE_LIMIT = 4096
+MORE_MARKER = "\n   … +{count} more"
+# Room kept free in the last allowed part for the "+N more" marker.
+_MORE_RESERVE = len(MORE_MARKER.format(count=10**7))
+
+
+def utf16_len(text: str) -> int:
+    return len(text.encode("utf-16-le")) // 2
+
+
+def fit_line(line: str, budget: int) -> str:
+    """Cut a single oversized line down to ``budget`` code units."""
+    if utf16_len(line) <= budget:
+        return line
+    cut = line[: max(0, budget - 1)]
+    while cut and utf16_len(cut) > budget - 1:
+        cut = cut[:-1]
+    return cut + "…"
+
+
+def stream_chunks(
+    head: str,
+    lines: Iterable[str],
+    tail: str = "",
+    continuation: str = "",
+    limit: int = TELEGRAM_MESSAGE_LIMIT,
+    max_parts: int = 3,
+) -> Iterator[str]:
+    """Yield ``head + lines + tail`` as chunks no longer than ``limit``.
+
+    Lines are pulled one at a time and never split. Overflow goes into a new
+    chunk that starts with ``continuation``, up to ``max_parts`` chunks; the
+    rest is replaced by a "+N more" marker. ``tail`` always closes the last
+    chunk.
+    """
+    if max_parts < 1:
+        raise ValueError("max_parts must be at least 1")
+    tail_size = utf16_len(tail)
+    iterator = iter(lines)
+    parts_left = max_parts
+    chunk = [head]
+    size = utf16_len(head)
+
+    for line in iterator:
+        line = "\n" + line
+        reserve = tail_size + (_MORE_RESERVE if parts_left == 1 else 0)
+        line = fit_line(line, limit - utf16_len(continuation) - reserve)
+        line_size = utf16_len(line)
+        if size + line_size + reserve <= limit:
+            chunk.append(line)
+            size += line_size
+            continue
+        if parts_left == 1:
+            remaining = 1 + sum(1 for _ in iterator)
+            chunk.append(MORE_MARKER.format(count=remaining))
+            break
+        yield "".join(chunk)
+        parts_left -= 1
+        chunk = [continuation, line]
+        size = utf16_len(continuation) + line_size
+
+    chunk.append(tail)
+    yield "".join(chunk)
+
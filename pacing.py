@@ -0,0 +1,146 @@
+"""
+Shared send pacing with FloodWait-aware backoff.
+
+One controller per account (and kind of request) decides when the next call
+may go out. It keeps:
+
+* an inter-send delay tuned by AIMD - every success adds ``step`` sends per
+  second to the rate, every FloodWait multiplies the delay by ``backoff`` -
+  so the pace settles just under what Telegram actually tolerates for this
+  account;
+* an account-wide pause for FloodWait, which Telegram applies per account;
+* per-target pauses for slow mode and for the minimum interval between posts
+  to the same group.
+
+Controllers can be nested: several jobs, each with its own rate budget, can
+share one ``account`` controller so a FloodWait on any of them pauses all.
+
+Nothing here sleeps on behalf of a failed call: callers ask ``ready_at`` and
+schedule the retry themselves (see broadcast.Broadcaster), or use ``call``
+for a single request that should simply be retried in a loop.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from telethon.errors import FloodWaitError, SlowModeWaitError
+
+logger = logging.getLogger(__name__)
+
+
+def flood_wait_seconds(exc: Exception) -> Optional[float]:
+    """Seconds Telegram asked us to wait, or None if ``exc`` is not a flood error."""
+    if isinstance(exc, (FloodWaitError, SlowModeWaitError)):
+        return float(exc.seconds)
+    return None
+
+
+class PacingController:
+    """Spaces calls account-wide and per target, and learns from FloodWait."""
+
+    def __init__(
+        self,
+        delay: float = 1.0,
+        min_delay: float = 0.5,
+        max_delay: float = 60,
+        step: float = 0.02,
+        backoff: float = 2.0,
+        target_interval: float = 0,
+        account: Optional["PacingController"] = None,
+    ):
+        self.account = account
+        self.delay = max(delay, min_delay)
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.step = step
+        self.backoff = backoff
+        self.target_interval = target_interval
+        self._next_slot = 0.0
+        self._account_until = 0.0
+        self._target_until: Dict[Any, float] = {}
+        self.flood_waits = 0
+        self.flood_wait_seconds = 0.0
+
+    def ready_at(self, target: Any = None) -> float:
+        """Monotonic time at which a call to ``target`` may be attempted."""
+        ready = max(self._next_slot, self._account_until, self._target_until.get(target, 0.0))
+        if self.account is not None:
+            ready = max(ready, self.account.ready_at())
+        return ready
+
+    async def acquire(self, target: Any = None) -> None:
+        """Wait for ``target``'s turn and reserve the next send slot."""
+        while True:
+            now = time.monotonic()
+            ready = self.ready_at(target)
+            if ready <= now:
+                self._next_slot = now + self.delay
+                if self.account is not None:
+                    self.account._next_slot = now + self.account.delay
+                return
+            await asyncio.sleep(ready - now)
+
+    def on_success(self, target: Any = None) -> None:
+        # Additive increase in rate space, so recovering from a backoff takes
+        # as many successes at 100 msg/s as at 1 msg/s relative to the rate.
+        if self.delay > 0:
+            self.delay = max(self.min_delay, 1 / (1 / self.delay + self.step))
+        if target is not None and self.target_interval > 0:
+            self._target_until[target] = time.monotonic() + self.target_interval
+        if self.account is not None:
+            self.account.on_success()
+
+    def on_flood_wait(self, seconds: float, target: Any = None, account_wide: bool = True) -> float:
+        """Record a FloodWait; returns the monotonic time the retry may run.
+
+        With ``account_wide`` false (slow mode) only ``target`` is paused: it
+        is a per-chat limit and says nothing about the account's send rate.
+        """
+        now = time.monotonic()
+        until = now + seconds
+        if account_wide or target is None:
+            self._pause(seconds, now, until)
+            if self.account is not None:
+                self.account._pause(seconds, now, until)
+            logger.warning("⏰ Flood wait %.0fs; send delay now %.2fs", seconds, self.delay)
+        else:
+            self._target_until[target] = max(self._target_until.get(target, 0.0), until)
+            logger.info("🐢 Slow mode %.0fs for %s", seconds, target)
+        return until
+
+    def _pause(self, seconds: float, now: float, until: float) -> None:
+        self._back_off(seconds, now >= self._account_until)
+        self._account_until = max(self._account_until, until)
+
+    def _back_off(self, seconds: float, new_pause: bool) -> None:
+        # Multiplicative decrease of the send rate, once per pause: the sends
+        # already in flight when the limit hit report it too, and must not
+        # compound the backoff.
+        if new_pause:
+            self.delay = min(self.max_delay, self.delay * self.backoff)
+        self.flood_waits += 1
+        self.flood_wait_seconds += seconds
+
+    def on_error(self, exc: Exception, target: Any = None) -> Optional[float]:
+        """Handle ``exc`` if it is a flood error; returns the retry time or None."""
+        seconds = flood_wait_seconds(exc)
+        if seconds is None:
+            return None
+        # Slow mode is a per-chat limit; FloodWait applies to the whole account.
+        return self.on_flood_wait(seconds, target, account_wide=not isinstance(exc, SlowModeWaitError))
+
+    async def call(self, func: Callable[[], Awaitable[Any]], target: Any = None, max_attempts: int = 5) -> Any:
+        """Run ``func`` in turn, retrying (iteratively) after FloodWait."""
+        for attempt in range(1, max_attempts + 1):
+            await self.acquire(target)
+            try:
+                result = await func()
+            except (FloodWaitError, SlowModeWaitError) as exc:
+                self.on_error(exc, target)
+                if attempt == max_attempts:
+                    raise
+                continue
+            self.on_success(target)
+            return result
@@ -0,0 +1,142 @@
+"""
+Persistent cache of resolved Telegram peers shared by the monitor and senders.
+
+Resolving a username or invite link costs an RPC (and ImportChatInviteRequest
+is heavily flood-limited), yet the answer - a peer id plus its access hash -
+never changes for a given account. The cache keeps those input peers in a
+JSON file, one section per account, so a cold start makes no resolve calls.
+A cached peer is only re-resolved when Telegram rejects it.
+"""
+
+import json
+import logging
+import os
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from telethon import TelegramClient, utils
+from telethon.errors import ChannelInvalidError, ChatIdInvalidError, PeerIdInvalidError
+from telethon.tl.types import InputPeerChannel, InputPeerChat, InputPeerUser
+
+DEFAULT_PEER_CACHE_PATH = "peer_cache.json"
+
+# Errors that mean the cached id/access hash is no longer usable.
+STALE_PEER_ERRORS = (PeerIdInvalidError, ChannelInvalidError, ChatIdInvalidError)
+
+Resolver = Callable[[TelegramClient, str], Awaitable[Any]]
+
+
+def _to_record(entity: Any) -> Dict[str, Any]:
+    peer = utils.get_input_peer(entity)
+    title = getattr(entity, "title", None) or getattr(entity, "username", None)
+    if isinstance(peer, InputPeerChannel):
+        return {"type": "channel", "id": peer.channel_id, "hash": peer.access_hash, "title": title}
+    if isinstance(peer, InputPeerChat):
+        return {"type": "chat", "id": peer.chat_id, "title": title}
+    if isinstance(peer, InputPeerUser):
+        return {"type": "user", "id": peer.user_id, "hash": peer.access_hash, "title": title}
+    raise TypeError(f"Cannot cache peer of type {type(peer).__name__}")
+
+
+def _to_peer(record: Dict[str, Any]):
+    if record["type"] == "channel":
+        return InputPeerChannel(record["id"], record["hash"])
+    if record["type"] == "chat":
+        return InputPeerChat(record["id"])
+    return InputPeerUser(record["id"], record["hash"])
+
+
+async def default_resolver(client: TelegramClient, key: str):
+    return await client.get_entity(key)
+
+
+class PeerCache:
+    """Maps group identifiers (usernames, ids, invite links) to input peers."""
+
+    def __init__(self, path: Optional[str] = DEFAULT_PEER_CACHE_PATH):
+        self.path = path
+        self._accounts: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._records: Dict[str, Dict[str, Any]] = {}
+        self._dirty = False
+        self.hits = 0
+        self.misses = 0
+
+    def load(self) -> None:
+        if self.path is None or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as handle:
+                self._accounts = json.load(handle)
+        except (OSError, ValueError) as exc:
+            logging.warning("Ignoring unreadable peer cache %s: %s", self.path, exc)
+
+    async def attach(self, client: TelegramClient, account: Optional[str] = None) -> None:
+        """Select the section for the logged-in account (access hashes are per account).
+
+        Pass ``account`` when the caller already knows a stable key for the
+        session, to skip the get_me round trip.
+        """
+        if account is None:
+            me = await client.get_me(input_peer=True)
+            account = str(me.user_id)
+        self._records = self._accounts.setdefault(account, {})
+
+    def save(self) -> None:
+        if self.path is None or not self._dirty:
+            return
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as handle:
+                json.dump(self._accounts, handle)
+            os.replace(tmp_path, self.path)
+        except OSError as exc:
+            logging.warning("Failed to write peer cache %s: %s", self.path, exc)
+            return
+        self._dirty = False
+
+    def get(self, key: str):
+        record = self._records.get(key)
+        return None if record is None else _to_peer(record)
+
+    def title(self, key: str) -> str:
+        record = self._records.get(key)
+        return (record or {}).get("title") or key
+
+    def remember(self, key: str, entity: Any):
+        record = _to_record(entity)
+        if self._records.get(key) != record:
+            self._records[key] = record
+            self._dirty = True
+        return _to_peer(record)
+
+    def invalidate(self, key: str) -> None:
+        if self._records.pop(key, None) is not None:
+            self._dirty = True
+
+    async def resolve(self, client: TelegramClient, key: str, resolver: Resolver = default_resolver):
+        """Return the cached input peer for ``key``, resolving it only on a miss."""
+        peer = self.get(key)
+        if peer is not None:
+            self.hits += 1
+            return peer
+        self.misses += 1
+        entity = await resolver(client, key)
+        if entity is None:
+            raise ValueError(f"Could not resolve {key!r}")
+        return self.remember(key, entity)
+
+    async def call(
+        self,
+        client: TelegramClient,
+        key: str,
+        action: Callable[[Any], Awaitable[Any]],
+        resolver: Resolver = default_resolver,
+    ):
+        """Run ``action(peer)``, re-resolving once if the cached peer went stale."""
+        peer = await self.resolve(client, key, resolver)
+        try:
+            return await action(peer)
+        except STALE_PEER_ERRORS as exc:
+            logging.warning("Cached peer for %s is stale (%s); resolving again", key, exc)
+            self.invalidate(key)
+            peer = await self.resolve(client, key, resolver)
+            return await action(peer)
@@ -0,0 +1,157 @@
+"""
+Single-pass parser that turns a raw rain-bot post into a RainAlert record.
+
+Amount patterns, the coin ticker, the users line and the giver line are all
+alternatives of one compiled regex, so the raw text is scanned exactly once.
+Line captures sit inside lookaheads so amounts on those lines are still seen.
+"""
+
+import hashlib
+import re
+from typing import Iterable, List, Optional, Pattern, Tuple, Union
+
+from keyword_classifier import Context
+
+NOT_SPECIFIED = "Not specified"
+DEFAULT_CURRENCY = "CRYPTO"
+
+_NUMBER = re.compile(r"\d[\d,]*(?:\.\d+)?")
+_UNIT_PREFIXES = (("₦", "NGN"), ("ngn", "NGN"), ("naira", "NGN"), ("$", "USD"))
+
+
+class RainAlert:
+    """Structured view of one rain post."""
+
+    __slots__ = (
+        "amount",
+        "amount_value",
+        "amount_unit",
+        "currency",
+        "users",
+        "giver",
+        "country",
+        "flag",
+        "audience",
+    )
+
+    def __init__(
+        self,
+        amount: str = NOT_SPECIFIED,
+        amount_value: Optional[float] = None,
+        amount_unit: Optional[str] = None,
+        currency: str = DEFAULT_CURRENCY,
+        users: Tuple[str, ...] = (),
+        giver: Optional[str] = None,
+        country: str = "",
+        flag: str = "",
+        audience: str = "",
+    ):
+        self.amount = amount
+        self.amount_value = amount_value
+        self.amount_unit = amount_unit
+        self.currency = currency
+        self.users = users
+        self.giver = giver
+        self.country = country
+        self.flag = flag
+        self.audience = audience
+
+    @property
+    def user_count(self) -> int:
+        return len(self.users)
+
+    def fingerprint(self) -> Optional[int]:
+        """Stable 64-bit hash of the rain's content, or None if too little was parsed.
+
+        Country and the raw wording are left out, so the same rain announced in
+        another channel or reposted under a new id hashes the same. Without a
+        users line, amount and giver alone would match unrelated rains, so
+        such posts get no fingerprint.
+        """
+        if not self.users:
+            return None
+        value = "" if self.amount_value is None else f"{self.amount_value:.8f}"
+        users = ",".join(sorted(user.lower() for user in self.users))
+        giver = (self.giver or "").strip().lower()
+        key = "\x1f".join((value, self.amount_unit or "", self.currency.upper(), giver, users))
+        return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"RainAlert({fields})"
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, RainAlert):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+
+def _amount_unit(amount: str) -> Optional[str]:
+    lowered = amount.lower()
+    for prefix, unit in _UNIT_PREFIXES:
+        if lowered.startswith(prefix):
+            return unit
+    return None
+
+
+class RainParser:
+    """Compiles the amount patterns and line rules into one scanner."""
+
+    def __init__(self, amount_patterns: Iterable[Union[str, Pattern]]):
+        sources: List[str] = [
+            pattern.pattern if isinstance(pattern, re.Pattern) else pattern
+            for pattern in amount_patterns
+        ]
+        self.amount_groups = [f"amount{index}" for index in range(len(sources))]
+        alternatives = [
+            r"^(?=[^\S\n]*👥(?P<users>[^\n]*))",
+            r"^(?=[^\S\n]*(?P<giver>(?:🎁|by:)[^\n]*))",
+            r"(?-i:\((?P<currency>[A-Z]{3,10})\))",
+        ]
+        alternatives += [
+            f"(?P<{group}>{source})" for group, source in zip(self.amount_groups, sources)
+        ]
+        self.pattern = re.compile("|".join(alternatives), re.IGNORECASE | re.MULTILINE)
+        self._priority = {group: index for index, group in enumerate(self.amount_groups)}
+
+    def parse(self, text: str, context: Optional[Context] = None) -> RainAlert:
+        amount = None
+        amount_rank = len(self.amount_groups)
+        currency = None
+        users_text = None
+        giver_text = None
+
+        for match in self.pattern.finditer(text):
+            group = match.lastgroup
+            if match.group("users") is not None:
+                if ":" in match.group("users"):
+                    users_text = match.group("users")
+            elif match.group("giver") is not None:
+                giver_text = match.group("giver")
+            elif group == "currency":
+                if currency is None:
+                    currency = match.group("currency")
+            elif group in self._priority and self._priority[group] < amount_rank:
+                amount_rank = self._priority[group]
+                amount = match.group(group).strip()
+
+        alert = RainAlert()
+        if amount is not None:
+            alert.amount = amount
+            alert.amount_unit = _amount_unit(amount)
+            number = _NUMBER.search(amount)
+            if number:
+                alert.amount_value = float(number.group(0).replace(",", ""))
+        if currency is not None:
+            alert.currency = currency
+        if users_text is not None:
+            _label, users_part = users_text.split(":", 1)
+            alert.users = tuple(u.strip() for u in users_part.split(",") if u.strip())
+        if giver_text is not None:
+            giver = giver_text.replace("🎁", "").strip()
+            if giver.lower().startswith("by:"):
+                giver = giver[3:].strip()
+            alert.giver = giver
+        if context is not None:
+            alert.country, alert.flag, alert.audience = context
+        return alert
@@ -0,0 +1,202 @@
+"""
+Offline replay benchmark for the rain monitor pipeline.
+
+Feeds recorded or synthetic rain-bot posts through the real handler from
+telethon_nigeria_monitor.register_event_handler, using an in-process fake
+TelegramClient that records sends instead of talking to Telegram.
+
+Usage:
+    python replay_benchmark.py --corpus messages.jsonl
+    python replay_benchmark.py --synthetic 5000 --burst 200 --rate 500
+
+A corpus file holds one JSON object per line with a "text" field (plain
+strings are accepted too).
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from datetime import datetime, timezone
+from typing import Iterator, List, Optional
+
+import telethon_nigeria_monitor as monitor
+from fx_rates import FALLBACK_USD_INR_RATE, RateTable
+
+SOURCE = "RainAnalytics"
+TARGET = "replay_target"
+SOURCE_CHAT_ID = -1001234567890
+
+SAMPLE_NAMES = ["ada", "bola", "chidi", "emeka", "funke", "ibrahim", "kemi", "musa", "ngozi", "tunde"]
+SAMPLE_TICKERS = ["XRP", "TRX", "USDT", "TON", "DOGE"]
+SAMPLE_LANGUAGES = ["Nigeria", "Hausa", "Hindi", "Urdu", "Pakistan", "English", "Spanish"]
+
+
+class FakeMessage:
+    __slots__ = ("id", "chat_id", "date")
+
+    def __init__(self, message_id: int, chat_id: int, date: datetime):
+        self.id = message_id
+        self.chat_id = chat_id
+        self.date = date
+
+
+class FakeChat:
+    def __init__(self, username: str):
+        self.username = username
+
+
+class FakeEvent:
+    """The subset of events.NewMessage.Event the monitor handler uses."""
+
+    __slots__ = ("raw_text", "chat_id", "message", "_chat")
+
+    def __init__(self, text: str, message_id: int, chat_id: int = SOURCE_CHAT_ID, source: str = SOURCE):
+        self.raw_text = text
+        self.chat_id = chat_id
+        self.message = FakeMessage(message_id, chat_id, datetime.now(timezone.utc))
+        self._chat = FakeChat(source)
+
+    async def get_chat(self):
+        return self._chat
+
+
+class FakeTelegramClient:
+    """Records handlers and outgoing messages; never touches the network."""
+
+    def __init__(self, send_latency: float = 0.0):
+        self.handlers = []
+        self.sent = []
+        self.send_latency = send_latency
+
+    def on(self, _event_builder):
+        def decorator(func):
+            self.handlers.append(func)
+            return func
+        return decorator
+
+    async def send_message(self, entity, message, parse_mode=None):
+        if self.send_latency:
+            await asyncio.sleep(self.send_latency)
+        self.sent.append((entity, message))
+
+
+def synthetic_message(rng: random.Random, match_ratio: float = 0.8) -> str:
+    """Build one rain-bot style post; about ``match_ratio`` of them match."""
+    language = rng.choice(SAMPLE_LANGUAGES[:5] if rng.random() < match_ratio else SAMPLE_LANGUAGES[5:])
+    users = rng.sample(SAMPLE_NAMES, rng.randint(1, len(SAMPLE_NAMES)))
+    amount = rng.choice([f"${rng.uniform(0.01, 5):.2f}", f"₦{rng.randint(100, 5000):,}"])
+    return (
+        f"🌧 Rain in {language} chat!\n"
+        f"💰 {amount} per user ({rng.choice(SAMPLE_TICKERS)})\n"
+        f"👥 Users: {', '.join(users)}\n"
+        f"🎁 By: {rng.choice(SAMPLE_NAMES)}"
+    )
+
+
+def load_corpus(path: str) -> List[str]:
+    texts = []
+    with open(path, "r", encoding="utf-8") as handle:
+        for line in handle:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            texts.append(record["text"] if isinstance(record, dict) else str(record))
+    return texts
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def replay(
+    texts: Iterator[str],
+    burst: int = 0,
+    rate: float = 0.0,
+    send_latency: float = 0.0,
+) -> dict:
+    """Push every text through the handler; ``burst``/``rate`` pace the feed."""
+    # Keep the FX lookup on its cached path so the replay stays offline.
+    monitor.FX_SERVICE.install(
+        RateTable({"INR": FALLBACK_USD_INR_RATE, "NGN": 1500.0}, fetched_at=time.time() + 365 * 24 * 3600)
+    )
+
+    client = FakeTelegramClient(send_latency=send_latency)
+    dispatcher = monitor.OutboundDispatcher(client, rate_per_second=1e9, burst=1e9, maxsize=1_000_000)
+    monitor.register_event_handler(client, SOURCE, TARGET, f"@{SOURCE}", dispatcher)
+    handler = client.handlers[0]
+
+    latencies: List[float] = []
+    seen = 0
+    started = time.perf_counter()
+    for message_id, text in enumerate(texts, 1):
+        event = FakeEvent(text, message_id)
+        begin = time.perf_counter()
+        await handler(event)
+        latencies.append(time.perf_counter() - begin)
+        seen += 1
+        if burst and rate and seen % burst == 0:
+            # Hold the average feed rate at ``rate`` messages/sec between bursts.
+            due = started + seen / rate
+            delay = due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+    handled = time.perf_counter() - started
+    await dispatcher.close(timeout=600)
+    drained = time.perf_counter() - started
+
+    return {
+        "messages": seen,
+        "forwarded": len(client.sent),
+        "handler_seconds": handled,
+        "total_seconds": drained,
+        "messages_per_second": seen / handled if handled else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "mean_ms": (statistics.fmean(latencies) * 1000) if latencies else 0.0,
+    }
+
+
+def print_report(result: dict) -> None:
+    print("📊 Replay results")
+    print(f"   Messages:        {result['messages']}")
+    print(f"   Forwarded:       {result['forwarded']}")
+    print(f"   Handler time:    {result['handler_seconds']:.3f}s")
+    print(f"   Drain time:      {result['total_seconds']:.3f}s")
+    print(f"   Throughput:      {result['messages_per_second']:,.0f} msg/s")
+    print(f"   Latency p50:     {result['p50_ms']:.3f} ms")
+    print(f"   Latency p99:     {result['p99_ms']:.3f} ms")
+    print(f"   Latency mean:    {result['mean_ms']:.3f} ms")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Replay rain posts through the monitor handler offline.")
+    parser.add_argument("--corpus", help="JSON-lines file of recorded posts")
+    parser.add_argument("--synthetic", type=int, default=0, help="number of synthetic posts to generate")
+    parser.add_argument("--burst", type=int, default=0, help="posts per burst (with --rate)")
+    parser.add_argument("--rate", type=float, default=0.0, help="average feed rate in posts/sec")
+    parser.add_argument("--match-ratio", type=float, default=0.8, help="share of synthetic posts that match")
+    parser.add_argument("--send-latency", type=float, default=0.0, help="fake send_message latency in seconds")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    if not args.corpus and not args.synthetic:
+        parser.error("pass --corpus and/or --synthetic N")
+
+    texts: List[str] = load_corpus(args.corpus) if args.corpus else []
+    rng = random.Random(args.seed)
+    texts.extend(synthetic_message(rng, args.match_ratio) for _ in range(args.synthetic))
+
+    result = asyncio.run(replay(iter(texts), args.burst, args.rate, args.send_latency))
+    print_report(result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Source -> per-country target routing for the rain monitor.
+
+A routing file maps any number of source channels to target channels keyed
+by the country resolved from KEYWORD_CONTEXT, so one TelegramClient can
+serve every source/target pair. Example ``routes.json``::
+
+    {
+      "routes": [
+        {
+          "source": "RainAnalytics",
+          "targets": {
+            "Nigeria": ["ng_rain_alerts"],
+            "India": "in_rain_alerts",
+            "*": "all_rain_alerts"
+          }
+        }
+      ]
+    }
+
+``"*"`` is the fallback for countries without their own entry.
+"""
+
+import hashlib
+import json
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple, TypeVar, Union
+
+DEFAULT_ROUTE = "*"
+
+
+def _clean_channel(name: str) -> str:
+    cleaned = str(name).strip().lstrip("@")
+    if not cleaned:
+        raise ValueError("Channel username cannot be empty")
+    return cleaned
+
+
+class RoutingTable:
+    """Resolves the target channels for a (source, country) pair."""
+
+    def __init__(self):
+        self._routes: Dict[str, Dict[str, Tuple[str, ...]]] = {}
+        self._chat_ids: Dict[int, str] = {}
+
+    def add_route(self, source: str, targets: Dict[str, Union[str, Iterable[str]]]) -> None:
+        source_key = _clean_channel(source).lower()
+        by_country = self._routes.setdefault(source_key, {})
+        for country, channels in targets.items():
+            if isinstance(channels, str):
+                channels = [channels]
+            merged = list(by_country.get(country.lower(), ()))
+            for channel in channels:
+                channel = _clean_channel(channel)
+                if channel not in merged:
+                    merged.append(channel)
+            by_country[country.lower()] = tuple(merged)
+
+    @classmethod
+    def single(cls, source: str, target: str) -> "RoutingTable":
+        table = cls()
+        table.add_route(source, {DEFAULT_ROUTE: target})
+        return table
+
+    @classmethod
+    def load(cls, path: str) -> "RoutingTable":
+        with open(path, "r", encoding="utf-8") as handle:
+            config = json.load(handle)
+        table = cls()
+        for route in config.get("routes", []):
+            if "source" not in route or "targets" not in route:
+                raise ValueError(f"Route in {path} needs 'source' and 'targets': {route!r}")
+            targets = route["targets"]
+            if isinstance(targets, (str, list)):
+                targets = {DEFAULT_ROUTE: targets}
+            table.add_route(route["source"], targets)
+        if not table._routes:
+            raise ValueError(f"No routes defined in {path}")
+        return table
+
+    def sources(self) -> List[str]:
+        return list(self._routes)
+
+    def targets(self) -> List[str]:
+        seen: List[str] = []
+        for by_country in self._routes.values():
+            for channels in by_country.values():
+                seen.extend(channel for channel in channels if channel not in seen)
+        return seen
+
+    def bind_chat(self, chat_id: int, source: str) -> None:
+        """Remember which configured source a resolved chat id belongs to."""
+        self._chat_ids[chat_id] = _clean_channel(source).lower()
+
+    def source_for_chat(self, chat_id: int) -> Optional[str]:
+        return self._chat_ids.get(chat_id)
+
+    def targets_for(self, source: str, country: str) -> Tuple[str, ...]:
+        by_country = self._routes.get(source.lower())
+        if not by_country:
+            return ()
+        return by_country.get(country.lower(), by_country.get(DEFAULT_ROUTE, ()))
+
+
+Rendered = TypeVar("Rendered")
+
+
+class RenderCache:
+    """Small LRU of rendered messages (or their chunks) keyed by a hash of their inputs."""
+
+    def __init__(self, capacity: int = 256):
+        self.capacity = capacity
+        self._entries: "OrderedDict[Tuple[bytes, Hashable], Any]" = OrderedDict()
+
+    @staticmethod
+    def digest(text: str) -> bytes:
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+    def get_or_render(self, text: str, variant: Hashable, render: Callable[[], Rendered]) -> Rendered:
+        key = (self.digest(text), variant)
+        rendered = self._entries.get(key)
+        if rendered is not None:
+            self._entries.move_to_end(key)
+            return rendered
+        rendered = render()
+        self._entries[key] = rendered
+        if len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+        return rendered
@@ -1,20 +1,35 @@
+import time
+
+STARTED = time.monotonic()  # Startup-to-first-send is measured from here
+
 import asyncio
+import hashlib
 import logging
 import os
-from datetime import datetime
-from typing import List
+import sys
+from typing import TYPE_CHECKING, List, Optional
+
+from log_setup import setup_logging
 
-from telethon import TelegramClient, functions
-from telethon.errors import RPCError
+if TYPE_CHECKING:
+    from broadcast_engine import BroadcastEngine, JobConfig
+    from pacing import PacingController
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s %(levelname)s %(message)s",
-)
+# Telethon and the broadcast engine are imported where they are first needed,
+# so the one-shot run (--once) starts connecting as early as possible.
+
+setup_logging(level=logging.INFO)
 
 API_ID_ENV = "API_ID"
 API_HASH_ENV = "API_HASH"
 TARGET_GROUPS_ENV = "TARGET_GROUPS"  # Comma-separated group usernames or IDs
+JOBS_FILE_ENV = "JOBS_FILE"  # JSON jobs file; replaces TARGET_GROUPS and SEND_SCHEDULE
+PEER_CACHE_PATH_ENV = "PEER_CACHE_PATH"
+STRING_SESSION_ENV = "STRING_SESSION"  # From generate_session.py; used instead of a session file
+RUN_ONCE_ENV = "RUN_ONCE"  # Same as --once
+TEMPLATE_FILES_ENV = "TEMPLATE_FILES"  # Comma-separated template files/globs instead of the default template
+ROTATION_STATE_PATH_ENV = "ROTATION_STATE_PATH"  # Template rotation across restarts
+DELIVERY_LEDGER_PATH_ENV = "DELIVERY_LEDGER_PATH"  # Resume an interrupted cycle on the next start
 
 # Default message template - customize as needed
 DEFAULT_MESSAGE_TEMPLATE = """
@@ -30,6 +45,7 @@ Stay active and keep chatting! 🚀
 
 # How often to send messages (in seconds)
 SEND_INTERVAL = 3600  # 1 hour = 3600 seconds
+SEND_SCHEDULE_ENV = "SEND_SCHEDULE"  # Overrides SEND_INTERVAL: seconds or a cron expression
 
 
 def get_env_value(name: str) -> str:
@@ -39,106 +55,143 @@ def get_env_value(name: str) -> str:
     return value.strip()
 
 
-def parse_target_groups(groups_str: str) -> List[str]:
-    """Parse comma-separated group usernames/IDs/invite links"""
-    groups = [g.strip() for g in groups_str.split(",") if g.strip()]
-    if not groups:
-        raise ValueError("No target groups specified")
-    return groups
-
-
-async def join_group_if_needed(client: TelegramClient, group_link: str):
-    """Join group via invite link if not already a member"""
-    try:
-        # If it's an invite link, extract and join
-        if "t.me/+" in group_link or "t.me/joinchat/" in group_link:
-            # Extract hash from link
-            hash_part = group_link.split("/")[-1]
-            if hash_part.startswith("+"):
-                hash_part = hash_part[1:]
-            
-            try:
-                result = await client(functions.messages.ImportChatInviteRequest(hash_part))
-                logging.info(f"✅ Joined group via invite link")
-                return result.chats[0]
-            except Exception as e:
-                # Already joined or other error
-                logging.debug(f"Note: {e}")
-        
-        # Try to get entity (works for already joined groups)
-        return await client.get_entity(group_link)
-    except Exception as exc:
-        logging.error(f"Cannot access group {group_link}: {exc}")
-        raise
-
-
-def format_message(template: str) -> str:
-    """Format message with current timestamp"""
-    now = datetime.now()
-    timestamp = now.strftime("%Y-%m-%d %H:%M:%S IST")
-    return template.format(timestamp=timestamp)
-
-
-async def send_to_groups(client: TelegramClient, groups: List[str], message: str):
-    """Send message to all target groups"""
-    for group in groups:
-        try:
-            await client.send_message(group, message)
-            logging.info(f"✅ Sent message to {group}")
-            await asyncio.sleep(2)  # Small delay between sends
-        except RPCError as exc:
-            logging.error(f"❌ Failed to send to {group}: {exc}")
-
-
-async def scheduled_sender(client: TelegramClient, groups: List[str]):
-    """Main loop - send messages every hour"""
-    logging.info(f"Starting scheduled sender for {len(groups)} groups")
-    logging.info(f"Will send messages every {SEND_INTERVAL // 60} minutes")
-    
-    while True:
-        try:
-            message = format_message(DEFAULT_MESSAGE_TEMPLATE)
-            logging.info("📤 Sending scheduled messages...")
-            await send_to_groups(client, groups, message)
-            logging.info(f"✅ Completed sending to all groups. Next send in {SEND_INTERVAL // 60} minutes.")
-        except Exception as exc:
-            logging.error(f"Error in scheduled sender: {exc}")
-        
-        await asyncio.sleep(SEND_INTERVAL)
-
-
-async def main():
+def load_jobs(groups_raw: Optional[str]) -> List["JobConfig"]:
+    """JOBS_FILE if set, else one job for TARGET_GROUPS with TEMPLATE_FILES or the default template"""
+    from broadcast_engine import JobConfig, load_jobs as load_jobs_file, parse_groups
+
+    jobs_file = os.getenv(JOBS_FILE_ENV)
+    if jobs_file:
+        return load_jobs_file(jobs_file)
+    template_files = parse_groups(os.getenv(TEMPLATE_FILES_ENV, ""))
+    return [
+        JobConfig(
+            "scheduled_sender",
+            parse_groups(groups_raw or ""),
+            templates=[] if template_files else [DEFAULT_MESSAGE_TEMPLATE],
+            template_files=template_files,
+            schedule=os.getenv(SEND_SCHEDULE_ENV, str(SEND_INTERVAL)),
+            timestamp_format="%Y-%m-%d %H:%M:%S IST",
+        )
+    ]
+
+
+def load_budget() -> Optional["PacingController"]:
+    """The jobs file's account send budget; None keeps the engine default"""
+    from broadcast_engine import load_account_budget
+
+    jobs_file = os.getenv(JOBS_FILE_ENV)
+    return load_account_budget(jobs_file) if jobs_file else None
+
+
+def report_startup(first_sent: Optional[float], finished: float) -> None:
+    """Log (and add to the GitHub Actions job summary) how fast the run was"""
+    if first_sent is None:
+        logging.warning("⏱️  No message was sent (%.2fs total)", finished - STARTED)
+        return
+    logging.info(
+        "⏱️  Startup to first send: %.2fs, total run: %.2fs", first_sent - STARTED, finished - STARTED
+    )
+    summary_path = os.getenv("GITHUB_STEP_SUMMARY")
+    if summary_path:
+        with open(summary_path, "a", encoding="utf-8") as handle:
+            handle.write(
+                f"Startup to first send: **{first_sent - STARTED:.2f}s** · total run: {finished - STARTED:.2f}s\n"
+            )
+
+
+async def send_once(engine: "BroadcastEngine") -> bool:
+    """One broadcast of every job; True if anything was sent. Groups resolve lazily from the peer cache"""
+    reports = await engine.run_once()
+    first_sent = min(
+        (sent for sent in (report.first_sent() for report in reports.values()) if sent is not None),
+        default=None,
+    )
+    report_startup(first_sent, time.monotonic())
+    return first_sent is not None
+
+
+async def main(once: bool = False):
     try:
         api_id = int(get_env_value(API_ID_ENV))
         api_hash = get_env_value(API_HASH_ENV)
-        groups_raw = get_env_value(TARGET_GROUPS_ENV)
-    except (RuntimeError, ValueError) as exc:
+        groups_raw = None if os.getenv(JOBS_FILE_ENV) else get_env_value(TARGET_GROUPS_ENV)
+        jobs = load_jobs(groups_raw)
+        budget = load_budget()
+    except (RuntimeError, ValueError, OSError) as exc:
         logging.error(exc)
         raise SystemExit(1) from exc
-
-    target_groups = parse_target_groups(groups_raw)
     
-    client = TelegramClient("scheduled_sender", api_id, api_hash)
+    from telethon import TelegramClient
+    from broadcast_engine import BroadcastEngine
+    from delivery_ledger import DEFAULT_LEDGER_PATH, DeliveryLedger
+    from peer_cache import DEFAULT_PEER_CACHE_PATH, PeerCache
+    from templates import RotationState
+
+    string_session = os.getenv(STRING_SESSION_ENV, "").strip()
+    account = None
+    if string_session:
+        from telethon.sessions import StringSession
+
+        session = StringSession(string_session)
+        # A stable cache key for this login, without a get_me round trip
+        account = "session-" + hashlib.blake2b(string_session.encode("utf-8"), digest_size=8).hexdigest()
+    else:
+        session = "scheduled_sender"
     
+    client = TelegramClient(session, api_id, api_hash)
+    peers = PeerCache(os.getenv(PEER_CACHE_PATH_ENV, DEFAULT_PEER_CACHE_PATH) or None)
+    rotation = RotationState(os.getenv(ROTATION_STATE_PATH_ENV, "rotation_state.json") or None)
+    rotation.load()
+    ledger = DeliveryLedger(os.getenv(DELIVERY_LEDGER_PATH_ENV, DEFAULT_LEDGER_PATH) or None)
+    ledger.open()
+    engine = BroadcastEngine(client, jobs, peers, account_pacing=budget, rotation=rotation, ledger=ledger)
+    
+    if once:
+        # Connect while the peer cache loads; never prompt for a login here
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(client.connect(), loop.run_in_executor(None, peers.load))
+        sent = False
+        try:
+            if not await client.is_user_authorized():
+                logging.error("❌ The session is not authorized (expired or revoked); run generate_session.py again")
+                raise SystemExit(1)
+            await peers.attach(client, account)
+            flusher = asyncio.create_task(ledger.run_flush())
+            try:
+                sent = await send_once(engine)
+            finally:
+                flusher.cancel()
+        finally:
+            peers.save()
+            await ledger.close()
+            await client.disconnect()
+        if not sent:
+            # Fail the run (e.g. the Actions job) instead of exiting 0 with nothing sent
+            logging.error("❌ No message was sent to any group")
+            raise SystemExit(1)
+        return
+    
+    peers.load()
     await client.start()
+    await peers.attach(client, account)
     logging.info("✅ Connected to Telegram")
     
-    # Verify all groups exist and join if needed
-    for group in target_groups:
-        try:
-            entity = await join_group_if_needed(client, group)
-            logging.info(f"✅ Ready to send to group: {getattr(entity, 'title', group)}")
-        except Exception as exc:
-            logging.error(f"❌ Cannot access group {group}: {exc}")
+    # Verify all groups exist and join if needed; cached groups cost no RPC
+    await engine.verify()
     
     # Start scheduled sending
+    flusher = asyncio.create_task(ledger.run_flush())
     try:
-        await scheduled_sender(client, target_groups)
+        await engine.run()
     except KeyboardInterrupt:
         logging.info("Shutdown requested by user")
     finally:
+        flusher.cancel()
+        peers.save()
+        await ledger.close()
         await client.disconnect()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    run_once = "--once" in sys.argv[1:] or os.getenv(RUN_ONCE_ENV, "") not in ("", "0", "false")
+    asyncio.run(main(once=run_once))
@@ -0,0 +1,209 @@
+"""
+Drift-free job scheduler for the group senders.
+
+Jobs sit in one min-heap keyed by their next due time and a single loop
+sleeps until the earliest one, so thousands of jobs cost one task rather
+than one sleeping task each. The next due time is computed from the
+schedule itself (not from when the previous run finished), so send time and
+errors never push later runs back.
+
+A schedule is either a fixed interval aligned to local wall-clock boundaries
+("3600" fires at the top of every hour) or a 5-field cron expression
+("*/30 * * * *", "0 9-21 * * 1-5"). Jobs can be spread over a window by a
+stable per-job offset so many jobs on the same schedule don't fire at once.
+"""
+
+import asyncio
+import heapq
+import logging
+import time
+import zlib
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+
+class IntervalSchedule:
+    """Every ``seconds``, on boundaries of local time (plus ``offset``)."""
+
+    def __init__(self, seconds: float, offset: float = 0):
+        if seconds <= 0:
+            raise ValueError("interval must be positive")
+        self.seconds = seconds
+        self.offset = offset
+
+    def next_after(self, ts: float) -> float:
+        local_offset = time.localtime(ts).tm_gmtoff
+        base = ts + local_offset - self.offset
+        return (base // self.seconds + 1) * self.seconds - local_offset + self.offset
+
+    def __repr__(self) -> str:
+        return f"every {self.seconds:g}s"
+
+
+def _cron_field(field: str, low: int, high: int) -> Set[int]:
+    values: Set[int] = set()
+    for part in field.split(","):
+        part, _, step_text = part.partition("/")
+        step = int(step_text) if step_text else 1
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start_text, end_text = part.split("-", 1)
+            start, end = int(start_text), int(end_text)
+        else:
+            start = int(part)
+            end = high if step_text else start
+        if start < low or end > high or start > end or step < 1:
+            raise ValueError(f"Invalid cron field {field!r}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronSchedule:
+    """Standard 5-field cron: minute hour day-of-month month day-of-week (0=Sunday)."""
+
+    def __init__(self, expression: str, offset: float = 0):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression needs 5 fields: {expression!r}")
+        self.expression = expression
+        self.offset = offset
+        self.minutes = _cron_field(fields[0], 0, 59)
+        self.hours = _cron_field(fields[1], 0, 23)
+        self.days = _cron_field(fields[2], 1, 31)
+        self.months = _cron_field(fields[3], 1, 12)
+        weekdays = _cron_field(fields[4], 0, 7)
+        self.weekdays = {day % 7 for day in weekdays}
+        # Cron ORs day-of-month and day-of-week when both are restricted.
+        self._any_day = fields[2] == "*"
+        self._any_weekday = fields[4] == "*"
+
+    def _day_matches(self, moment: datetime) -> bool:
+        day_ok = moment.day in self.days
+        weekday_ok = (moment.isoweekday() % 7) in self.weekdays
+        if self._any_day or self._any_weekday:
+            return day_ok and weekday_ok
+        return day_ok or weekday_ok
+
+    def next_after(self, ts: float) -> float:
+        moment = datetime.fromtimestamp(ts - self.offset).replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = moment + timedelta(days=366 * 5)
+        while moment < limit:
+            if moment.month not in self.months:
+                moment = (moment.replace(day=1) + timedelta(days=32)).replace(day=1, hour=0, minute=0)
+            elif not self._day_matches(moment):
+                moment = (moment + timedelta(days=1)).replace(hour=0, minute=0)
+            elif moment.hour not in self.hours:
+                moment = (moment + timedelta(hours=1)).replace(minute=0)
+            elif moment.minute not in self.minutes:
+                moment += timedelta(minutes=1)
+            else:
+                return moment.timestamp() + self.offset
+        raise ValueError(f"Cron expression never fires: {self.expression!r}")
+
+    def __repr__(self) -> str:
+        return f"cron {self.expression!r}"
+
+
+Schedule = Union[IntervalSchedule, CronSchedule]
+
+
+def parse_schedule(spec: Union[str, float, int], offset: float = 0) -> Schedule:
+    """A number of seconds ("3600") or a cron expression ("0 * * * *")."""
+    if isinstance(spec, (int, float)):
+        return IntervalSchedule(float(spec), offset)
+    spec = spec.strip()
+    try:
+        return IntervalSchedule(float(spec), offset)
+    except ValueError:
+        return CronSchedule(spec, offset)
+
+
+def spread_offset(name: str, window: float) -> float:
+    """Stable offset in [0, window) for ``name``, so jobs fan out evenly."""
+    if window <= 0:
+        return 0.0
+    return (zlib.crc32(name.encode("utf-8")) % 10_000) / 10_000 * window
+
+
+class Job:
+    __slots__ = ("name", "schedule", "callback", "next_due", "running", "runs", "skipped")
+
+    def __init__(self, name: str, schedule: Schedule, callback: Callable[[], Awaitable[None]]):
+        self.name = name
+        self.schedule = schedule
+        self.callback = callback
+        self.next_due = 0.0
+        self.running: Optional[asyncio.Task] = None
+        self.runs = 0
+        self.skipped = 0
+
+
+class Scheduler:
+    """Runs many jobs from one heap and one sleeping loop."""
+
+    def __init__(self):
+        self._heap: List[Tuple[float, int, Job]] = []
+        self._jobs: Dict[str, Job] = {}
+        self._sequence = 0
+        self._wakeup = asyncio.Event()
+
+    def add(
+        self,
+        name: str,
+        schedule: Schedule,
+        callback: Callable[[], Awaitable[None]],
+        run_now: bool = False,
+    ) -> Job:
+        job = self._jobs[name] = Job(name, schedule, callback)
+        job.next_due = time.time() if run_now else schedule.next_after(time.time())
+        self._push(job)
+        return job
+
+    def remove(self, name: str) -> None:
+        # Stale heap entries are skipped when they come up.
+        self._jobs.pop(name, None)
+
+    def jobs(self) -> List[Job]:
+        return list(self._jobs.values())
+
+    def _push(self, job: Job) -> None:
+        heapq.heappush(self._heap, (job.next_due, self._sequence, job))
+        self._sequence += 1
+        self._wakeup.set()
+
+    def _start(self, job: Job, now: float) -> None:
+        if job.running is not None and not job.running.done():
+            # Never stack runs of the same job; catch up at the next slot.
+            job.skipped += 1
+            logger.warning("⏭️  Skipping %s: previous run still in progress", job.name)
+        else:
+            job.runs += 1
+            job.running = asyncio.ensure_future(self._run_job(job))
+        # Drift-free: the next slot comes from the schedule, and missed slots
+        # (after a long run or a suspended machine) are skipped, not replayed.
+        job.next_due = job.schedule.next_after(max(job.next_due, now))
+        self._push(job)
+
+    async def _run_job(self, job: Job) -> None:
+        try:
+            await job.callback()
+        except Exception:
+            logger.exception("❌ Scheduled job %s failed", job.name)
+
+    async def run(self) -> None:
+        while True:
+            now = time.time()
+            while self._heap and self._heap[0][0] <= now:
+                due, _, job = heapq.heappop(self._heap)
+                if self._jobs.get(job.name) is not job or due != job.next_due:
+                    continue
+                self._start(job, now)
+            self._wakeup.clear()
+            timeout = self._heap[0][0] - now if self._heap else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,177 @@
+"""
+Outbound send dispatcher for the rain monitor.
+
+Handlers enqueue rendered alerts and return immediately. Each target channel
+gets its own bounded queue, token bucket and worker task, so sends are
+spaced per channel, FloodWait pauses only the affected lane, and shutdown
+can drain whatever is still queued. With a PeerCache, targets are sent to by
+their cached input peer and re-resolved once if it has gone stale.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, NamedTuple, Optional
+
+from telethon.errors import FloodWaitError
+
+from peer_cache import PeerCache
+
+
+class OutboundMessage(NamedTuple):
+    target: Any
+    text: str
+    parse_mode: Optional[str] = "html"
+    on_failure: Optional[Callable[[Exception], None]] = None
+
+
+class TokenBucket:
+    """Classic token bucket: ``rate`` tokens per second, up to ``capacity``."""
+
+    def __init__(self, rate: float, capacity: float = 1):
+        if rate <= 0 or capacity < 1:
+            raise ValueError("rate must be positive and capacity at least 1")
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def pause(self, seconds: float) -> None:
+        """Block the bucket for ``seconds`` and empty it (used for FloodWait)."""
+        now = time.monotonic()
+        self.paused_until = max(self.paused_until, now + seconds)
+        self.tokens = 0
+        self.updated_at = self.paused_until
+
+    async def acquire(self) -> None:
+        while True:
+            now = time.monotonic()
+            if now < self.paused_until:
+                await asyncio.sleep(self.paused_until - now)
+                continue
+            self._refill(now)
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class _Lane:
+    def __init__(self, maxsize: int, bucket: TokenBucket):
+        self.queue: "asyncio.Queue[OutboundMessage]" = asyncio.Queue(maxsize=maxsize)
+        self.bucket = bucket
+        self.task: Optional[asyncio.Task] = None
+
+
+class OutboundDispatcher:
+    """Rate-limited, FloodWait-aware sender with one lane per target."""
+
+    def __init__(
+        self,
+        client,
+        rate_per_second: float = 1 / 1.5,
+        burst: float = 1,
+        maxsize: int = 1000,
+        target_rates: Optional[Dict[Any, float]] = None,
+        observe_send: Optional[Callable[[float], None]] = None,
+        peers: Optional[PeerCache] = None,
+    ):
+        self.client = client
+        self.rate_per_second = rate_per_second
+        self.burst = burst
+        self.maxsize = maxsize
+        self.target_rates = dict(target_rates or {})
+        self.observe_send = observe_send
+        self.peers = peers
+        self.sent_count = 0
+        self.flood_wait_seconds = 0
+        self._lanes: Dict[Any, _Lane] = {}
+        self._closing = False
+
+    def _lane(self, target) -> _Lane:
+        lane = self._lanes.get(target)
+        if lane is None:
+            rate = self.target_rates.get(target, self.rate_per_second)
+            lane = _Lane(self.maxsize, TokenBucket(rate, self.burst))
+            lane.task = asyncio.get_running_loop().create_task(self._worker(lane))
+            self._lanes[target] = lane
+        return lane
+
+    def enqueue(
+        self,
+        target,
+        text: str,
+        parse_mode: Optional[str] = "html",
+        on_failure: Optional[Callable[[Exception], None]] = None,
+    ) -> bool:
+        """Queue a message without waiting; returns False if it was rejected."""
+        if self._closing:
+            return False
+        try:
+            self._lane(target).queue.put_nowait(OutboundMessage(target, text, parse_mode, on_failure))
+        except asyncio.QueueFull:
+            logging.warning("Outbound queue for %s is full; dropping alert", target)
+            return False
+        return True
+
+    def depth(self) -> int:
+        return sum(lane.queue.qsize() for lane in self._lanes.values())
+
+    async def _worker(self, lane: _Lane) -> None:
+        while True:
+            item = await lane.queue.get()
+            try:
+                await self._deliver(item, lane.bucket)
+            except Exception as exc:
+                if item.on_failure is not None:
+                    item.on_failure(exc)
+                else:
+                    logging.error("Failed to send to %s: %s", item.target, exc)
+            finally:
+                lane.queue.task_done()
+
+    async def _send(self, item: OutboundMessage) -> None:
+        if self.peers is None:
+            await self.client.send_message(item.target, item.text, parse_mode=item.parse_mode)
+            return
+        await self.peers.call(
+            self.client,
+            item.target,
+            lambda peer: self.client.send_message(peer, item.text, parse_mode=item.parse_mode),
+        )
+
+    async def _deliver(self, item: OutboundMessage, bucket: TokenBucket) -> None:
+        while True:
+            await bucket.acquire()
+            started = time.perf_counter()
+            try:
+                await self._send(item)
+            except FloodWaitError as exc:
+                logging.warning("FloodWait on %s: pausing sends for %s seconds", item.target, exc.seconds)
+                self.flood_wait_seconds += exc.seconds
+                bucket.pause(exc.seconds)
+                continue
+            self.sent_count += 1
+            if self.observe_send is not None:
+                self.observe_send(time.perf_counter() - started)
+            return
+
+    async def close(self, timeout: float = 30) -> None:
+        """Stop accepting messages, drain queued ones, then stop the workers."""
+        self._closing = True
+        lanes = list(self._lanes.values())
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(lane.queue.join() for lane in lanes)), timeout
+            )
+        except asyncio.TimeoutError:
+            logging.warning("Dropped %d queued alerts on shutdown", self.depth())
+        for lane in lanes:
+            if lane.task is not None:
+                lane.task.cancel()
+        await asyncio.gather(*(lane.task for lane in lanes if lane.task), return_exceptions=True)
@@ -0,0 +1,131 @@
+"""
+Batched SQLite writer shared by the alert history and the delivery ledger.
+
+Callers only append row tuples to an in-memory batch; a single writer
+thread owns the connection and inserts each batch in one transaction, so
+the event loop never blocks on disk and commits never overlap. The database
+runs in WAL mode, so the query CLIs can read while the writer commits.
+
+Also holds the small helpers the stores' query CLIs share.
+"""
+
+import asyncio
+import logging
+import re
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+
+def connect(path: str, schema: str) -> sqlite3.Connection:
+    connection = sqlite3.connect(path, check_same_thread=False)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.executescript(schema)
+    return connection
+
+
+class BatchedWriter:
+    """Buffers rows for one INSERT statement and commits them in batches."""
+
+    def __init__(self, path: Optional[str], schema: str, insert: str, batch_size: int, name: str):
+        self.path = path
+        self.schema = schema
+        self.insert = insert
+        self.batch_size = batch_size
+        self.name = name
+        self._pending: List[Tuple[Any, ...]] = []
+        self._connection: Optional[sqlite3.Connection] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+        self._wakeup = asyncio.Event()
+        # Serializes flushes, so when flush() returns every row queued before
+        # the call is committed, even if a concurrent flush picked it up.
+        self._flush_lock = asyncio.Lock()
+        self.written = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._connection is not None
+
+    def open(self) -> None:
+        if self.path is None:
+            return
+        self._connection = connect(self.path, self.schema)
+
+    def add(self, row: Tuple[Any, ...]) -> None:
+        """Queue one row; never touches the disk."""
+        if self._connection is None:
+            return
+        self._pending.append(row)
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Run ``func(connection, *args)`` on the writer thread."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, self._connection, *args)
+
+    def _write(self, connection: sqlite3.Connection, rows: Sequence[Tuple[Any, ...]]) -> None:
+        with connection:
+            connection.executemany(self.insert, rows)
+        self.written += len(rows)
+
+    async def flush(self) -> None:
+        """Commit everything queued so far; rows queued meanwhile join the next batch."""
+        async with self._flush_lock:
+            if not self._pending or self._connection is None:
+                return
+            rows, self._pending = self._pending, []
+            try:
+                await self.run(self._write, rows)
+            except sqlite3.Error as exc:
+                logging.warning("Failed to write %s rows to %s: %s", len(rows), self.path, exc)
+
+    async def run_flush(self, interval: float = 2) -> None:
+        """Commit a batch every ``interval`` seconds, or sooner once it is full."""
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def close(self) -> None:
+        await self.flush()
+        if self._connection is not None:
+            connection, self._connection = self._connection, None
+            await asyncio.get_running_loop().run_in_executor(self._executor, connection.close)
+        self._executor.shutdown(wait=False)
+
+
+_DURATION = re.compile(r"^(\d+(?:\.\d+)?)([smhdw])$")
+_UNIT_SECONDS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+
+
+def parse_time(value: str, now: Optional[float] = None) -> float:
+    """Accept a relative duration like "7d"/"12h" or an ISO date/time (UTC)."""
+    match = _DURATION.match(value.strip().lower())
+    if match:
+        now = time.time() if now is None else now
+        return now - float(match.group(1)) * _UNIT_SECONDS[match.group(2)]
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def print_table(headers: List[str], rows: list) -> None:
+    def cell(value) -> str:
+        if value is None:
+            return "-"
+        if isinstance(value, float):
+            return f"{value:,.2f}"
+        return str(value)
+
+    lines = [headers] + [[cell(value) for value in row] for row in rows]
+    widths = [max(len(line[i]) for line in lines) for i in range(len(headers))]
+    for line in lines:
+        print("  ".join(value.ljust(width) for value, width in zip(line, widths)))
@@ -1,26 +1,51 @@
 import asyncio
-import json
 import logging
 import os
 import re
+import signal
 import time
-from datetime import timedelta, timezone
-from typing import Set, Tuple
-from urllib.error import URLError
-from urllib.request import urlopen
+from html import escape
+from typing import Awaitable, Callable, Dict, Iterator, Optional
 
 from telethon import TelegramClient, events
-from telethon.errors import RPCError
-
-logging.basicConfig(
-    level=logging.WARNING,
-    format="%(asctime)s %(levelname)s %(message)s",
-)
+from telethon.utils import get_peer_id
+
+from alert_history import DEFAULT_HISTORY_PATH, AlertHistory
+from checkpoints import CheckpointStore
+from digest import DigestBuffer, DigestEntry
+from dedup_store import ProcessedMessageStore, RecentFingerprints
+from fx_rates import DEFAULT_CRYPTO_IDS, FxRateService, RateTable
+from keyword_classifier import KeywordMatch
+from keyword_config import KeywordConfigWatcher, pattern_sources
+from log_setup import setup_logging
+from message_chunks import stream_chunks
+from metrics import MetricsRegistry, monitor_loop_lag, start_metrics_server
+from peer_cache import DEFAULT_PEER_CACHE_PATH, STALE_PEER_ERRORS, PeerCache
+from rain_parser import RainAlert
+from routing import RenderCache, RoutingTable
+from send_queue import OutboundDispatcher
+
+setup_logging(level=logging.WARNING)
 
 API_ID_ENV = "API_ID"
 API_HASH_ENV = "API_HASH"
 SOURCE_CHANNEL_ENV = "SOURCE_CHANNEL"
 TARGET_CHANNEL_ENV = "TARGET_CHANNEL"
+ROUTES_FILE_ENV = "ROUTES_FILE"
+PROCESSED_LOG_ENV = "PROCESSED_LOG_PATH"
+SEND_RATE_ENV = "SEND_RATE_PER_SECOND"
+SEND_BURST_ENV = "SEND_BURST"
+SEND_QUEUE_SIZE_ENV = "SEND_QUEUE_SIZE"
+CHECKPOINT_PATH_ENV = "CHECKPOINT_PATH"
+METRICS_HOST_ENV = "METRICS_HOST"
+METRICS_PORT_ENV = "METRICS_PORT"
+CRYPTO_PRICES_ENV = "CRYPTO_PRICES"
+KEYWORDS_FILE_ENV = "KEYWORDS_FILE"
+DIGEST_WINDOW_ENV = "DIGEST_WINDOW_SECONDS"
+ALERT_HISTORY_PATH_ENV = "ALERT_HISTORY_PATH"
+PEER_CACHE_PATH_ENV = "PEER_CACHE_PATH"
+CONTENT_DEDUP_WINDOW_ENV = "CONTENT_DEDUP_WINDOW_SECONDS"
+ALERT_MAX_PARTS_ENV = "ALERT_MAX_PARTS"
 
 NIGERIA_TERMS = [
     "nigeria",
@@ -31,21 +56,6 @@ NIGERIA_TERMS = [
     "pakistan"
 ]
 
-def _term_to_pattern(term: str) -> re.Pattern:
-    return re.compile(
-        r"\b" + re.escape(term).replace("\\ ", r"\\s+") + r"\b",
-        re.IGNORECASE,
-    )
-
-NIGERIA_PATTERN = re.compile(
-    r"\b(?:" + "|".join(
-        re.escape(term).replace("\\ ", r"\\s+") for term in NIGERIA_TERMS
-    ) + r")\b",
-    re.IGNORECASE,
-)
-
-KEYWORD_PATTERNS = [(term, _term_to_pattern(term)) for term in NIGERIA_TERMS]
-
 KEYWORD_CONTEXT = {
     "nigeria": ("Nigeria", "🇳🇬", "Nigeria Users"),
     "hausa": ("Nigeria", "🇳🇬", "Nigeria Users"),
@@ -64,8 +74,41 @@ CURRENCY_PATTERNS = [
     re.compile(r"(\d[\d,]*(?:\.\d+)?\s*(?:per\s+user))", re.IGNORECASE),
 ]
 
-# Cache processed source message ids to prevent reposting duplicates during runtime.
-processed_messages: Set[Tuple[int, int]] = set()
+AMOUNT_SYMBOLS = {"USD": "$", "NGN": "₦"}
+
+# Posts a single huge alert may be split into before users become "+N more".
+ALERT_MAX_PARTS = int(os.getenv(ALERT_MAX_PARTS_ENV, "3"))
+
+# Built-in defaults; KEYWORDS_FILE can override any of them at runtime.
+KEYWORD_DEFAULTS = {
+    "terms": NIGERIA_TERMS,
+    "context": KEYWORD_CONTEXT,
+    "default_context": DEFAULT_CONTEXT,
+    "currency_patterns": pattern_sources(CURRENCY_PATTERNS),
+}
+
+# The classifier (one scan for every term) and parser (one scan for amounts,
+# coin ticker, users and giver) are compiled off the hot path and swapped in
+# as a versioned unit when the file changes.
+KEYWORDS = KeywordConfigWatcher(os.getenv(KEYWORDS_FILE_ENV, "keywords.json"), KEYWORD_DEFAULTS)
+
+# Recently processed source message ids, persisted so restarts don't repost duplicates.
+PROCESSED_CAPACITY = 5000
+PROCESSED_COMPACT_INTERVAL_SECONDS = 600
+processed_messages = ProcessedMessageStore(
+    capacity=PROCESSED_CAPACITY,
+    path=os.getenv(PROCESSED_LOG_ENV, "processed_messages.log"),
+)
+
+# Same rain seen again (other source, new id) within this window is not reposted.
+CONTENT_DEDUP_WINDOW_SECONDS = float(os.getenv(CONTENT_DEDUP_WINDOW_ENV, "900"))
+
+# Catch-up after downtime: the newest this many posts per source, throttled.
+BACKFILL_LIMIT = 1000
+BACKFILL_MAX_QUEUED = 100
+
+# (chat_id, message_id, raw_text, source) -> whether the alert was queued
+AlertProcessor = Callable[[int, int, str, str], Awaitable[bool]]
 
 
 def get_env_value(name: str) -> str:
@@ -86,230 +129,428 @@ def display_username(username: str) -> str:
     return f"@{username}" if not username.startswith("@") else username
 
 
-def is_nigeria_alert(text: str) -> bool:
-    return bool(NIGERIA_PATTERN.search(text))
+def classify_message(text: str) -> KeywordMatch:
+    return KEYWORDS.current.classifier.classify(text)
 
 
-def matched_keywords(text: str) -> Set[str]:
-    detected: Set[str] = set()
-    for term, pattern in KEYWORD_PATTERNS:
-        if pattern.search(text):
-            detected.add(term)
-    return detected
+USD_INR_CACHE_TTL_SECONDS = 300
 
+# Refreshed in the background; lookups never touch the network.
+FX_SERVICE = FxRateService(
+    ttl_seconds=USD_INR_CACHE_TTL_SECONDS,
+    crypto_ids=DEFAULT_CRYPTO_IDS if os.getenv(CRYPTO_PRICES_ENV, "").lower() in ("1", "true", "yes") else None,
+)
 
-def resolve_context(matched: Set[str]) -> Tuple[str, str, str]:
-    for term in matched:
-        context = KEYWORD_CONTEXT.get(term.lower())
-        if context:
-            return context
-    return DEFAULT_CONTEXT
 
+# Hot-path metrics, served in Prometheus text format (METRICS_PORT=0 disables).
+METRICS = MetricsRegistry()
+MESSAGES_SEEN = METRICS.counter("rain_messages_seen_total", "Source posts received")
+MESSAGES_MATCHED = METRICS.counter("rain_messages_matched_total", "Posts that matched a keyword")
+MESSAGES_DUPLICATE = METRICS.counter("rain_messages_duplicate_total", "Matched posts suppressed as content duplicates")
+STAGE_LATENCY = METRICS.histogram("rain_stage_latency_seconds", "Per-stage processing latency", "stage")
+MATCH_LATENCY = STAGE_LATENCY.labels("match")
+PARSE_LATENCY = STAGE_LATENCY.labels("parse")
+RENDER_LATENCY = STAGE_LATENCY.labels("render")
+FX_LATENCY = STAGE_LATENCY.labels("fx")
+SEND_LATENCY = STAGE_LATENCY.labels("send")
+METRICS.gauge("rain_fx_cache_hit_ratio", "Share of FX lookups served fresh from cache", FX_SERVICE.hit_ratio)
+EVENT_LOOP_LAG = METRICS.gauge("rain_event_loop_lag_seconds", "How late the event loop wakes a sleeping task")
+
+
+def register_dispatcher_metrics(dispatcher: OutboundDispatcher) -> None:
+    dispatcher.observe_send = SEND_LATENCY.observe
+    METRICS.counter("rain_messages_forwarded_total", "Alerts delivered to a target", lambda: dispatcher.sent_count)
+    METRICS.gauge("rain_outbound_queue_depth", "Alerts waiting in the outbound queue", dispatcher.depth)
+    METRICS.counter(
+        "rain_flood_wait_seconds_total", "Seconds of FloodWait imposed by Telegram", lambda: dispatcher.flood_wait_seconds
+    )
 
-USD_INR_CACHE_TTL_SECONDS = 300
-USD_INR_CACHE: dict = {"rate": None, "fetched_at": 0.0}
 
+def render_amount(alert: RainAlert, table: Optional[RateTable] = None) -> str:
+    """Render the per-user amount with its INR and USD value when it is convertible."""
+    if alert.amount_value is None:
+        return alert.amount
+    if table is None:
+        table = FX_SERVICE.get_table()
+    # A bare number is counted in the post's coin, e.g. "25 per user (TRX)".
+    code = alert.amount_unit or alert.currency
+    usd_value = table.usd_value(alert.amount_value, code)
+    inr_value = table.convert(alert.amount_value, code, "INR")
+    if usd_value is None or inr_value is None:
+        return alert.amount
+
+    currency_suffix = f" {alert.currency}" if alert.currency else ""
+    if code == "USD":
+        return f"₹{inr_value:,.2f} (${usd_value:,.2f}){currency_suffix}"
+    if alert.amount_unit:
+        original = f"{AMOUNT_SYMBOLS.get(code, code + ' ')}{alert.amount_value:,.2f}"
+        return f"₹{inr_value:,.2f} (${usd_value:,.2f} · {original}){currency_suffix}"
+    return f"₹{inr_value:,.2f} (${usd_value:,.2f} · {alert.amount_value:,g} {code})"
 
-def get_usd_to_inr_rate() -> float:
-    """Fetch live USD->INR rate with caching and fallback."""
-    now = time.time()
-    cached_rate = USD_INR_CACHE.get("rate")
-    fetched_at = USD_INR_CACHE.get("fetched_at", 0.0)
-    if cached_rate and (now - fetched_at) < USD_INR_CACHE_TTL_SECONDS:
-        return cached_rate
 
-    try:
-        with urlopen("https://open.er-api.com/v6/latest/USD", timeout=5) as response:
-            payload = json.loads(response.read().decode("utf-8"))
-        rate = payload.get("rates", {}).get("INR")
-        if isinstance(rate, (int, float)) and rate > 0:
-            USD_INR_CACHE["rate"] = float(rate)
-            USD_INR_CACHE["fetched_at"] = now
-            return float(rate)
-    except (URLError, ValueError, json.JSONDecodeError) as exc:
-        logging.warning("Failed to fetch USD/INR rate, using fallback: %s", exc)
-
-    return 91.0
-
-
-def convert_usd_to_inr(amount_str: str, currency: str = "") -> str:
-    """Convert USD amount to INR with live rate."""
-    usd_match = re.search(r"\$\s?([\d,]+(?:\.\d+)?)", amount_str)
-    if usd_match:
-        usd_value = float(usd_match.group(1).replace(",", ""))
-        rate = get_usd_to_inr_rate()
-        inr_value = usd_value * rate
-        currency_suffix = f" {currency}" if currency else ""
-        return f"₹{inr_value:,.2f} (${usd_value:,.2f}){currency_suffix}"
-    return amount_str
-
-
-def extract_amount(text: str) -> str:
-    for pattern in CURRENCY_PATTERNS:
-        match = pattern.search(text)
-        if match:
-            return match.group(1).strip()
-    return "Not specified"
-
-
-def extract_currency(text: str) -> str:
-    """Extract currency code from source message like (XRP), (TRX), (USDT), etc."""
-    currency_match = re.search(r"\(([A-Z]{3,10})\)", text)
-    if currency_match:
-        return currency_match.group(1)
-    return "CRYPTO"
-
-
-def clean_message(text: str) -> str:
-    trimmed = text.strip()
-    trimmed = re.sub(r"([\U00010000-\U0010FFFF])\1{2,}", r"\1\1", trimmed)
-    trimmed = re.sub(r"\n{3,}", "\n\n", trimmed)
-    trimmed = re.sub(r"[ \t]{2,}", " ", trimmed)
-    cleaned_lines = []
-    skip_block = False
-    for line in trimmed.splitlines():
-        normalized = line.lower().strip()
-        if normalized.startswith("⭐️--- this week’s top rain collectors") or normalized.startswith("🌟--- this month’s top rain collectors"):
-            skip_block = True
-            continue
-        if normalized.startswith("💸--- this week’s top rain givers") or normalized.startswith("🌾--- top 10 farmers"):
-            skip_block = True
-            continue
-        if skip_block and (not normalized or normalized[0].isdigit() or normalized.startswith("1️⃣") or normalized.startswith("2️⃣") or normalized.startswith("3️⃣") or normalized.startswith("4️⃣") or normalized.startswith("5️⃣")):
-            continue
-        skip_block = False
-        cleaned_lines.append(line)
-    return "\n".join(line for line in cleaned_lines if line.strip())
-
-
-def extract_detail_lines(text: str) -> Tuple[str, int, str]:
-    by_line = None
-    users_line = None
-    user_count = 0
-    users_list = []
-    
-    for line in text.splitlines():
-        stripped = line.strip()
-        if stripped.startswith("🎁") or stripped.lower().startswith("by:"):
-            # Extract just the "By: rain-bot" part
-            by_text = stripped.replace("🎁", "").strip()
-            if by_text.lower().startswith("by:"):
-                by_line = f"🎯 {by_text}"
-            else:
-                by_line = f"🎯 By: {by_text}"
-        elif stripped.startswith("👥"):
-            # Extract users from "👥 Users: name1, name2, name3..."
-            users_text = stripped[1:].strip()
-            if ":" in users_text:
-                label, users_part = users_text.split(":", 1)
-                users_list = [u.strip() for u in users_part.split(",") if u.strip()]
-                user_count = len(users_list)
-                # Format users as clean bulleted list
-                formatted_users = "\n".join([f"   • <b>{user}</b>" for user in users_list])
-                users_line = f"👤 Users:\n{formatted_users}"
-    
-    # Return users first, then by
+def render_detail_block(alert: RainAlert) -> str:
+    # Users first, then the giver
     result = []
-    if users_line:
-        result.append(users_line)
-    if by_line:
-        result.append(by_line)
-    return "\n\n".join(result), user_count, ", ".join(users_list) if users_list else ""
-
-
-def format_message(raw_text: str, source_display: str, msg_timestamp: str) -> str:
-    cleaned_text = clean_message(raw_text)
-    amount = extract_amount(raw_text)
-    currency = extract_currency(raw_text)
-    amount_with_inr = convert_usd_to_inr(amount, currency)
-    keyword_hits = matched_keywords(raw_text)
-    country, flag, _audience = resolve_context(keyword_hits)
-    detail_block, user_count, users_str = extract_detail_lines(raw_text)
-    
+    if alert.users:
+        formatted_users = "\n".join(f"   • <b>{escape(user)}</b>" for user in alert.users)
+        result.append(f"👤 Users:\n{formatted_users}")
+    if alert.giver is not None:
+        result.append(f"🎯 By: {escape(alert.giver)}")
+    return "\n\n".join(result)
+
+
+def render_alert_chunks(
+    alert: RainAlert,
+    table: Optional[RateTable] = None,
+    max_parts: int = ALERT_MAX_PARTS,
+) -> Iterator[str]:
+    """Lazily render an alert as one or more posts within Telegram's length limit.
+
+    Users past the last allowed part are summarised as "+N more".
+    """
     # Clean user count line - only show if we have users
-    user_count_line = f"👥 Total Users: {user_count}" if user_count > 0 else ""
-    
-    return (
-        f"🌧 RAIN ALERT — {country.upper()} {flag}\n\n"
-        f"💵 Amount per User: {amount_with_inr}\n"
+    user_count_line = f"👥 Total Users: {alert.user_count}" if alert.user_count > 0 else ""
+    head = (
+        f"🌧 RAIN ALERT — {alert.country.upper()} {alert.flag}\n\n"
+        f"💵 Amount per User: {render_amount(alert, table)}\n"
         f"{user_count_line}\n\n"
-        f"{detail_block}"
+    )
+    giver_line = f"🎯 By: {escape(alert.giver)}" if alert.giver is not None else ""
+    if not alert.users:
+        return stream_chunks(head + giver_line, (), max_parts=max_parts)
+    return stream_chunks(
+        head + "👤 Users:",
+        (f"   • <b>{escape(user)}</b>" for user in alert.users),
+        tail=f"\n\n{giver_line}" if giver_line else "",
+        continuation="👤 Users (continued):",
+        max_parts=max_parts,
     )
 
 
-def ensure_timestamp_string(dt) -> str:
-    ist = timezone(timedelta(hours=5, minutes=30), name="IST")
-    if dt.tzinfo is None:
-        dt = dt.replace(tzinfo=timezone.utc)
-    dt = dt.astimezone(ist)
-    return dt.strftime("%Y-%m-%d %H:%M:%S %Z")
+def render_digest_line(alert: RainAlert, table: Optional[RateTable] = None) -> str:
+    """One-line summary of an alert for digest posts."""
+    parts = [render_amount(alert, table)]
+    if alert.user_count:
+        parts.append(f"👥 {alert.user_count}")
+    if alert.giver is not None:
+        parts.append(f"🎯 {escape(alert.giver)}")
+    return " · ".join(parts)
+
+
+def register_event_handler(
+    client: TelegramClient,
+    source_channel: str,
+    target_channel: str,
+    source_display: str,
+    dispatcher: Optional[OutboundDispatcher] = None,
+) -> OutboundDispatcher:
+    routes = RoutingTable.single(source_channel, target_channel)
+    return register_routed_handler(client, routes, dispatcher)
+
+
+def create_alert_processor(
+    routes: RoutingTable,
+    dispatcher: OutboundDispatcher,
+    checkpoints: Optional[CheckpointStore] = None,
+    digest: Optional[DigestBuffer] = None,
+    history: Optional[AlertHistory] = None,
+) -> AlertProcessor:
+    """Build the classify -> dedup -> render -> enqueue pipeline for one message.
+
+    With ``digest`` set, alerts are merged into windowed digest posts instead
+    of being sent one by one. With ``history`` set, every forwarded alert is
+    also recorded there.
+    """
+    render_cache = RenderCache()
+    recent_content = RecentFingerprints(ttl_seconds=CONTENT_DEDUP_WINDOW_SECONDS)
+
+    async def process(chat_id: int, message_id: int, text: str, source: str) -> bool:
+        if checkpoints is not None:
+            checkpoints.advance(chat_id, message_id)
+        if not text:
+            return False
+        MESSAGES_SEEN.inc()
+
+        # One config snapshot per message, even if a reload lands mid-way.
+        config = KEYWORDS.current
+        started = time.perf_counter()
+        keyword_match = config.classifier.classify(text)
+        MATCH_LATENCY.observe(time.perf_counter() - started)
+        if not keyword_match:
+            return False
+        MESSAGES_MATCHED.inc()
+
+        message_key = (chat_id, message_id)
+        if message_key in processed_messages:
+            return False
 
+        targets = routes.targets_for(source, keyword_match.context[0])
+        if not targets:
+            return False
 
+        processed_messages.add(message_key)
 
-def register_event_handler(client: TelegramClient, source_channel: str, target_channel: str, source_display: str) -> None:
-    @client.on(events.NewMessage(chats=source_channel))
+        started = time.perf_counter()
+        alert = config.parser.parse(text, keyword_match.context)
+        PARSE_LATENCY.observe(time.perf_counter() - started)
+
+        # Drop targets that already got this rain from another source or id.
+        fingerprint = alert.fingerprint()
+        fresh_targets = []
+        for target in targets:
+            content_key = None if fingerprint is None else hash((fingerprint, target))
+            if content_key is not None and recent_content.check_and_add(content_key):
+                continue
+            fresh_targets.append((target, content_key))
+        if not fresh_targets:
+            MESSAGES_DUPLICATE.inc()
+            return False
+
+        started = time.perf_counter()
+        table = FX_SERVICE.get_table()
+        FX_LATENCY.observe(time.perf_counter() - started)
+        if history is not None:
+            history.record(alert, table, source, message_id)
+        render_started = time.perf_counter()
+
+        def failure_handler(content_key: Optional[int]) -> Callable[[Exception], None]:
+            def on_failure(exc: Exception) -> None:
+                logging.error("Failed to forward alert id=%s: %s", message_id, exc)
+                processed_messages.discard(message_key)
+                if content_key is not None:
+                    recent_content.discard(content_key)
+            return on_failure
+
+        if digest is not None:
+            line = render_digest_line(alert, table)
+            RENDER_LATENCY.observe(time.perf_counter() - render_started)
+            for target, content_key in fresh_targets:
+                digest.add(
+                    target,
+                    DigestEntry(alert.country, alert.flag, alert.user_count, line, failure_handler(content_key)),
+                )
+            return True
+
+        # Rendered once per distinct post, config and rate table, then fanned out.
+        outbound_chunks = render_cache.get_or_render(
+            text,
+            (keyword_match.context, config.version, table.version),
+            lambda: tuple(render_alert_chunks(alert, table)),
+        )
+        RENDER_LATENCY.observe(time.perf_counter() - render_started)
+
+        # The dispatcher spaces sends per channel to reduce spam/ban risk.
+        queued = False
+        for target, content_key in fresh_targets:
+            on_failure = failure_handler(content_key)
+            for chunk in outbound_chunks:
+                if not dispatcher.enqueue(target, chunk, on_failure=on_failure):
+                    on_failure(RuntimeError("outbound queue is full"))
+                    break
+            else:
+                queued = True
+        return queued
+
+    return process
+
+
+def register_routed_handler(
+    client: TelegramClient,
+    routes: RoutingTable,
+    dispatcher: Optional[OutboundDispatcher] = None,
+    processor: Optional[AlertProcessor] = None,
+    live: Optional[asyncio.Event] = None,
+) -> OutboundDispatcher:
+    """Register the NewMessage handler; events wait on ``live`` if it is given."""
+    if dispatcher is None:
+        dispatcher = OutboundDispatcher(client)
+    if processor is None:
+        processor = create_alert_processor(routes, dispatcher)
+
+    @client.on(events.NewMessage(chats=routes.sources()))
     async def handler(event):
         if not event.raw_text:
             return
 
-        text = event.raw_text
-        if not is_nigeria_alert(text):
-            return
-
-        message_key = (event.message.chat_id, event.message.id)
-        if message_key in processed_messages:
-            return
-
-        processed_messages.add(message_key)
-        
-        # Limit cache size to prevent memory leaks
-        if len(processed_messages) > 500:
-            oldest_items = list(processed_messages)[:100]
-            for item in oldest_items:
-                processed_messages.discard(item)
-
-        timestamp = ensure_timestamp_string(event.message.date)
-        outbound_message = format_message(text, source_display, timestamp)
-        
-        # Detect country for logging
-        keyword_hits = matched_keywords(text)
-        country_name, _, _ = resolve_context(keyword_hits)
-
+        if live is not None and not live.is_set():
+            await live.wait()
+
+        source = routes.source_for_chat(event.chat_id)
+        if source is None:
+            chat = await event.get_chat()
+            source = getattr(chat, "username", None) or ""
+            routes.bind_chat(event.chat_id, source)
+
+        await processor(event.message.chat_id, event.message.id, event.raw_text, source)
+
+    return dispatcher
+
+
+async def backfill(
+    client: TelegramClient,
+    entities: Dict[str, object],
+    processor: AlertProcessor,
+    dispatcher: OutboundDispatcher,
+    checkpoints: CheckpointStore,
+    limit: int = BACKFILL_LIMIT,
+    peers: Optional[PeerCache] = None,
+) -> int:
+    """Replay posts newer than each source's checkpoint through the pipeline.
+
+    Only the newest ``limit`` posts per source are replayed, oldest first; a
+    longer gap is logged, since the checkpoint moves past the skipped posts.
+    """
+
+    async def replay_source(source: str, entity, chat_id: int, min_id: int) -> int:
+        # Newest first, with one extra post to tell whether the gap was longer.
+        messages = [
+            message async for message in client.iter_messages(entity, min_id=min_id, limit=limit + 1, wait_time=1)
+        ]
+        if len(messages) > limit:
+            skipped = messages.pop()
+            logging.warning(
+                "Backfill window truncated for %s: posts %s-%s not replayed (more than %d since the checkpoint)",
+                source, min_id + 1, skipped.id, limit,
+            )
+        count = 0
+        for message in reversed(messages):
+            await processor(chat_id, message.id, message.raw_text or "", source)
+            count += 1
+            # Keep the catch-up from flooding the outbound queue.
+            while dispatcher.depth() > BACKFILL_MAX_QUEUED:
+                await asyncio.sleep(0.5)
+        return count
+
+    replayed = 0
+    for source, entity in entities.items():
+        chat_id = get_peer_id(entity)
+        min_id = checkpoints.get(chat_id)
+        if min_id is None:
+            continue
         try:
-            # Add delay to reduce spam/ban risk
-            await asyncio.sleep(1.5)
-            await client.send_message(target_channel, outbound_message, parse_mode="html")
-        except RPCError as exc:
-            logging.error("Failed to forward alert id=%s: %s", event.message.id, exc)
-            processed_messages.discard(message_key)
-            return
+            count = await replay_source(source, entity, chat_id, min_id)
+        except STALE_PEER_ERRORS:
+            if peers is None:
+                raise
+            # The cached access hash was rejected before any message arrived.
+            peers.invalidate(source)
+            entity = await peers.resolve(client, source)
+            count = await replay_source(source, entity, chat_id, min_id)
+        if count:
+            logging.warning("Backfilled %d messages from %s since id=%s", count, source, min_id)
+        replayed += count
+    return replayed
+
+
+def load_routes() -> RoutingTable:
+    routes_file = os.getenv(ROUTES_FILE_ENV)
+    if routes_file:
+        return RoutingTable.load(routes_file)
+    source_channel = sanitize_username(get_env_value(SOURCE_CHANNEL_ENV))
+    target_channel = sanitize_username(get_env_value(TARGET_CHANNEL_ENV))
+    return RoutingTable.single(source_channel, target_channel)
 
 
 def main() -> None:
     try:
         api_id = int(get_env_value(API_ID_ENV))
         api_hash = get_env_value(API_HASH_ENV)
-        source_channel_raw = get_env_value(SOURCE_CHANNEL_ENV)
-        target_channel_raw = get_env_value(TARGET_CHANNEL_ENV)
-    except (RuntimeError, ValueError) as exc:
+        routes = load_routes()
+    except (RuntimeError, ValueError, OSError) as exc:
         logging.error(exc)
         raise SystemExit(1) from exc
 
-    source_channel = sanitize_username(source_channel_raw)
-    target_channel = sanitize_username(target_channel_raw)
-
-    source_display = display_username(source_channel_raw)
-    target_display = display_username(target_channel_raw)
-
     client = TelegramClient("nigeria_rain_monitor", api_id, api_hash)
 
-    register_event_handler(client, source_channel, target_channel, source_display)
+    peers = PeerCache(os.getenv(PEER_CACHE_PATH_ENV, DEFAULT_PEER_CACHE_PATH) or None)
+    dispatcher = OutboundDispatcher(
+        client,
+        rate_per_second=float(os.getenv(SEND_RATE_ENV, str(1 / 1.5))),
+        burst=float(os.getenv(SEND_BURST_ENV, "1")),
+        maxsize=int(os.getenv(SEND_QUEUE_SIZE_ENV, "1000")),
+        peers=peers,
+    )
+    register_dispatcher_metrics(dispatcher)
+    metrics_host = os.getenv(METRICS_HOST_ENV, "127.0.0.1")
+    metrics_port = int(os.getenv(METRICS_PORT_ENV, "9108"))
+    checkpoints = CheckpointStore(os.getenv(CHECKPOINT_PATH_ENV, "monitor_checkpoints.json"))
+    digest_window = float(os.getenv(DIGEST_WINDOW_ENV, "0"))
+    digest = None
+    if digest_window > 0:
+        digest = DigestBuffer(
+            digest_window,
+            lambda target, text, on_failure: dispatcher.enqueue(target, text, on_failure=on_failure),
+        )
+    history = AlertHistory(os.getenv(ALERT_HISTORY_PATH_ENV, DEFAULT_HISTORY_PATH) or None)
+    processor = create_alert_processor(routes, dispatcher, checkpoints, digest, history)
+    live = asyncio.Event()
+    register_routed_handler(client, routes, dispatcher, processor, live)
+
+    async def shutdown():
+        # Drain queued alerts while still connected, then let the runner exit.
+        if digest is not None:
+            digest.flush_all()
+        await dispatcher.close()
+        await client.disconnect()
 
     async def runner():
+        processed_messages.open()
+        checkpoints.load()
+        history.open()
+        KEYWORDS.load()
+        peers.load()
         await client.start()
-        await client.get_entity(source_channel)
-        await client.get_entity(target_channel)
-        await client.run_until_disconnected()
+        await peers.attach(client)
+        FX_SERVICE.start()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, lambda: asyncio.ensure_future(shutdown()))
+            except (NotImplementedError, RuntimeError):
+                pass  # Windows event loops don't support signal handlers.
+        background = [
+            asyncio.create_task(processed_messages.run_compaction(PROCESSED_COMPACT_INTERVAL_SECONDS)),
+            asyncio.create_task(checkpoints.run_flush()),
+            asyncio.create_task(history.run_flush()),
+            asyncio.create_task(monitor_loop_lag(EVENT_LOOP_LAG)),
+            asyncio.create_task(KEYWORDS.watch()),
+        ]
+        metrics_server = None
+        if metrics_port:
+            try:
+                metrics_server = await start_metrics_server(METRICS, metrics_host, metrics_port)
+            except OSError as exc:
+                logging.warning("Metrics endpoint disabled: %s", exc)
+        try:
+            # Cached peers make a restart resolve nothing over the network.
+            entities = {}
+            for source in routes.sources():
+                entity = await peers.resolve(client, source)
+                routes.bind_chat(get_peer_id(entity), source)
+                entities[source] = entity
+            # Targets too, so the dispatcher's first sends need no lookup.
+            for target in routes.targets():
+                await peers.resolve(client, target)
+            peers.save()
+            # Live events wait until everything posted while we were down is handled.
+            try:
+                await backfill(client, entities, processor, dispatcher, checkpoints, peers=peers)
+            finally:
+                live.set()
+            await client.run_until_disconnected()
+        finally:
+            for task in background:
+                task.cancel()
+            if metrics_server is not None:
+                metrics_server.close()
+            if digest is not None:
+                digest.flush_all()
+            await dispatcher.close()
+            await FX_SERVICE.stop()
+            checkpoints.close()
+            peers.save()
+            await history.close()
+            processed_messages.close()
 
     try:
         asyncio.run(runner())
@@ -0,0 +1,129 @@
+"""
+Precompiled message templates for the broadcast engine.
+
+Templates use str.format fields - ``{timestamp}``, ``{group}`` (the group
+identifier) and ``{title}`` (the group's title) - and can come from inline
+strings or files (one template per file; globs allowed). Each template is
+parsed once at load time into literal and field parts. A RenderCycle then
+renders each distinct (template, used variables) pair once per broadcast.
+Templates that don't mention a per-group field are therefore built once and
+shared by every group.
+
+The rotation position of each job is kept in a small JSON file so a restart
+continues with the next template instead of starting over.
+"""
+
+import glob
+import json
+import logging
+import os
+from string import Formatter
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+TEMPLATE_FIELDS = frozenset({"timestamp", "group", "title"})
+
+_Part = Tuple[str, Optional[str], str, Optional[str]]
+
+
+class CompiledTemplate:
+    """A template parsed once into (literal, field, spec, conversion) parts."""
+
+    __slots__ = ("name", "source", "parts", "fields")
+
+    def __init__(self, source: str, name: str = "<inline>"):
+        self.name = name
+        self.source = source
+        parts: List[_Part] = []
+        for literal, field, spec, conversion in Formatter().parse(source):
+            if field is not None and field not in TEMPLATE_FIELDS:
+                raise ValueError(
+                    f"Template {name} uses unknown field {{{field}}}; "
+                    f"allowed: {', '.join(sorted(TEMPLATE_FIELDS))}"
+                )
+            parts.append((literal, field, spec or "", conversion))
+        self.parts = tuple(parts)
+        # Only these variables can change the output, so only they key the cache.
+        self.fields = tuple(sorted({field for _, field, _, _ in parts if field is not None}))
+
+    def render(self, values: Mapping[str, object]) -> str:
+        out = []
+        for literal, field, spec, conversion in self.parts:
+            out.append(literal)
+            if field is None:
+                continue
+            value = values[field]
+            if conversion == "r":
+                value = repr(value)
+            elif conversion is not None:
+                value = str(value)
+            out.append(format(value, spec))
+        return "".join(out)
+
+    def __repr__(self) -> str:
+        return f"CompiledTemplate({self.name!r})"
+
+
+def load_template_files(patterns: Iterable[str], base_dir: str = ".") -> List[CompiledTemplate]:
+    """Compile every file matching ``patterns`` (sorted within each pattern)."""
+    templates = []
+    for pattern in patterns:
+        pattern = os.path.join(base_dir, os.path.expanduser(pattern))
+        paths = sorted(glob.glob(pattern))
+        if not paths:
+            raise ValueError(f"No template files match {pattern}")
+        for path in paths:
+            with open(path, "r", encoding="utf-8") as handle:
+                templates.append(CompiledTemplate(handle.read(), name=path))
+    return templates
+
+
+class RenderCycle:
+    """Renders templates for one broadcast cycle, each distinct input once."""
+
+    def __init__(self, **shared: object):
+        self.shared = shared
+        self._rendered: Dict[Tuple[int, Tuple[object, ...]], str] = {}
+        self.renders = 0
+        self.lookups = 0
+
+    def render(self, template: CompiledTemplate, **group_values: object) -> str:
+        values = {**self.shared, **group_values}
+        key = (id(template), tuple(values[field] for field in template.fields))
+        self.lookups += 1
+        text = self._rendered.get(key)
+        if text is None:
+            text = self._rendered[key] = template.render(values)
+            self.renders += 1
+        return text
+
+
+class RotationState:
+    """Persists each job's template rotation index across restarts."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._indexes: Dict[str, int] = {}
+
+    def load(self) -> None:
+        if self.path is None or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as handle:
+                self._indexes = {str(name): int(index) for name, index in json.load(handle).items()}
+        except (OSError, ValueError, AttributeError) as exc:
+            logging.warning("Ignoring unreadable rotation state %s: %s", self.path, exc)
+
+    def get(self, job: str) -> int:
+        return self._indexes.get(job, 0)
+
+    def set(self, job: str, index: int) -> None:
+        self._indexes[job] = index
+        if self.path is None:
+            return
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as handle:
+                json.dump(self._indexes, handle)
+            os.replace(tmp_path, self.path)
+        except OSError as exc:
+            logging.warning("Failed to write rotation state %s: %s", self.path, exc)